@@ -1,50 +1,67 @@
 from flask import Flask, redirect, request
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
-from flasgger import Swagger
-from models import db
+from config import get_config
+import database
+import docs
+import ratelimit
+import search
+import duplicates
+import jobs
+import cache
+import instrumentation
+import json_provider
+import schema
+from routes import register_routes
 import os
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///health_system.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = 'your-secret-key'
 
-# Initialize CORS
-CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
+def create_app(config=None, **overrides):
+    """Build the Flask app.
 
-# Initialize rate limiter
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
-)
+    config is a config class or a name from config.py (default: APP_ENV/FLASK_ENV);
+    keyword arguments override individual settings. Nothing touches the database at
+    import time. Pending migrations run here only when AUTO_MIGRATE is set.
 
-# Initialize JWT
-jwt = JWTManager(app)
+        flask --app app run
+        gunicorn 'app:create_app()'
+    """
+    app = Flask(__name__)
+    # Settings come from config.py and can be overridden with environment variables
+    app.config.from_object(config if isinstance(config, type) else get_config(config))
+    app.config.update(overrides)
 
-# Initialize Swagger
-swagger = Swagger(app)
+    CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}})
+    ratelimit.init_app(app)
+    docs.init_app(app)
 
-# Initialize the database
-db.init_app(app)
+    # Initialize the database with the engine tuning for the configured URI
+    database.init_app(app)
+    # Request timing, SQL counts and asynchronous request logging
+    instrumentation.init_app(app)
+    search.init_app(app)
+    duplicates.init_app(app)
+    # Background jobs run on a thread pool per process
+    jobs.init_app(app)
+    schema.init_app(app)
+    cache.init_app(app)
+    # orjson-backed JSON responses when installed
+    json_provider.init_app(app)
 
-# Create the database tables
-with app.app_context():
-    db.create_all()
+    if app.config.get('AUTO_MIGRATE'):
+        with app.app_context():
+            schema.upgrade_database()
 
-# Redirect HTTP to HTTPS in production
-@app.before_request
-def redirect_to_https():
-    if os.getenv('FLASK_ENV') == 'production' and not request.is_secure:
-        url = request.url.replace('http://', 'https://', 1)
-        return redirect(url, code=301)
+    # Redirect HTTP to HTTPS in production
+    @app.before_request
+    def redirect_to_https():
+        if os.getenv('FLASK_ENV') == 'production' and not request.is_secure:
+            url = request.url.replace('http://', 'https://', 1)
+            return redirect(url, code=301)
+
+    register_routes(app)
+    ratelimit.apply_route_limits(app)
+    return app
 
-# Import and register routes after app initialization to avoid circular imports
-from routes import register_routes
-register_routes(app)
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
+    create_app().run(debug=True, port=5001)
@@ -0,0 +1,289 @@
+"""Time the key API routes against a synthetic database of a given size.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_routes --scale 100k --output results.json
+    python -m benchmarks.bench_routes --scale 100k --baseline results.json
+
+Each scenario is timed through the Flask test client, so results measure the
+application and the database, not the network. The output is JSON for storing
+alongside a release and comparing with --baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Full /api/clients listings are only timed up to this many clients
+FULL_LIST_MAX = 10_000
+
+
+# Limiter storages compared by the rate limit scenarios; None switches limiting off
+RATE_LIMIT_STORAGES = {
+    'ratelimit_off': None,
+    'ratelimit_memory': 'memory://',
+    'ratelimit_sqlite': 'sqlite:///{database_path}-ratelimit',
+}
+
+
+def load_app(database_path, **overrides):
+    """The production app against a fresh database file, with rate limiting switched off."""
+    from app import create_app
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'REQUEST_LOG_LEVEL': os.getenv('REQUEST_LOG_LEVEL', 'WARNING'),
+        'RATELIMIT_ENABLED': False,
+        'AUTO_MIGRATE': True,
+        **overrides
+    }
+    return create_app('production', **settings)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    """Latency statistics of a list of millisecond timings."""
+    return {
+        'iterations': len(samples),
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(percentile(samples, 0.95), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'max_ms': round(max(samples), 3)
+    }
+
+
+def measure(http, request_for, iterations, warmup):
+    """Call request_for(i) -> (method, url, json_body) and time each full response."""
+    for i in range(warmup):
+        method, url, body = request_for(-1 - i)
+        http.open(url, method=method, json=body).get_data()
+    samples, sizes, statuses = [], [], set()
+    for i in range(iterations):
+        method, url, body = request_for(i)
+        started = time.perf_counter()
+        response = http.open(url, method=method, json=body)
+        data = response.get_data()
+        samples.append((time.perf_counter() - started) * 1000)
+        sizes.append(len(data))
+        statuses.add(response.status_code)
+    return {
+        **summarize(samples),
+        'avg_bytes': round(statistics.fmean(sizes), 1),
+        'statuses': sorted(statuses)
+    }
+
+
+def build_scenarios(app, http, clients, seed):
+    from sqlalchemy import select
+    from models import db, Client, Program
+    from pagination import encode_cursor
+
+    rng = random.Random(seed)
+    with app.app_context():
+        ids = list(db.session.execute(select(Client.id).order_by(Client.id).limit(5000)).scalars())
+        middle = db.session.execute(
+            select(Client.created_at, Client.id).order_by(Client.created_at, Client.id).offset(clients // 2).limit(1)
+        ).first()
+        surnames = list(db.session.execute(select(Client.last_name).distinct()).scalars())
+        # Registrations reuse existing names and birthdays, so the duplicate check finds
+        # full blocks
+        people = db.session.execute(
+            select(Client.first_name, Client.last_name, Client.date_of_birth).limit(1000)
+        ).all()
+        cohort = Program(name='Benchmark Cohort')
+        db.session.add(cohort)
+        db.session.commit()
+        cohort_id = cohort.id
+    deep_cursor = encode_cursor(middle.created_at.isoformat(), middle.id)
+    rng.shuffle(ids)
+    login = {'username': 'doctor', 'password': 'password'}
+
+    def registration(i, birthday=True):
+        person = people[i % len(people)]
+        return {
+            'first_name': person.first_name,
+            'last_name': person.last_name,
+            'email': f'bench.{"dob" if birthday else "nodob"}.{i}.{seed}@example.net',
+            'date_of_birth': person.date_of_birth.isoformat() if birthday and person.date_of_birth else None
+        }
+
+    def batch_ids(i):
+        start = (i * 50) % len(ids)
+        return ids[start:start + 50]
+
+    scenarios = {
+        'login': lambda i: ('POST', '/api/login', login),
+        'list_page': lambda i: ('GET', '/api/clients?limit=50', None),
+        'list_page_fields': lambda i: ('GET', '/api/clients?limit=50&fields=first_name,last_name', None),
+        'list_deep_page': lambda i: ('GET', f'/api/clients?limit=50&cursor={deep_cursor}', None),
+        'search': lambda i: ('GET', f'/api/clients/search?q={surnames[i % len(surnames)][:4]}', None),
+        'profile': lambda i: ('GET', f'/api/clients/{ids[i % len(ids)]}', None),
+        'profile_repeat': lambda i: ('GET', f'/api/clients/{ids[0]}', None),
+        'profile_batch': lambda i: ('POST', '/api/clients/batch', {'ids': batch_ids(i)}),
+        'register': lambda i: ('POST', '/api/clients', registration(i)),
+        'register_no_dob': lambda i: ('POST', '/api/clients', registration(i, birthday=False)),
+        'enroll': lambda i: ('POST', f'/api/clients/{ids[-1 - (i % len(ids))]}/programs', {'program_id': cohort_id}),
+        'stats': lambda i: ('GET', '/api/stats', None),
+    }
+    if clients <= FULL_LIST_MAX:
+        scenarios['list_all'] = lambda i: ('GET', '/api/clients', None)
+    return scenarios
+
+
+def measure_rate_limiting(database_path, iterations, warmup, only=None):
+    """Time one cheap, cached route with the limiter off and on each storage.
+
+    Limits are set high enough never to trip, so the difference between the medians
+    is the limiter's cost per request.
+    """
+    results = {}
+    for name, uri in RATE_LIMIT_STORAGES.items():
+        if only and name not in only:
+            continue
+        app = load_app(
+            database_path,
+            RATELIMIT_ENABLED=uri is not None,
+            RATELIMIT_STORAGE_URI=uri.format(database_path=database_path) if uri else None,
+            RATELIMIT_DEFAULT='1000000 per hour',
+            RATELIMIT_APPLICATION='1000000 per hour'
+        )
+        http = app.test_client()
+        token = http.post('/api/login', json={'username': 'doctor', 'password': 'password'}).json['access_token']
+        http.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        results[name] = measure(http, lambda i: ('GET', '/api/programs', None), iterations, warmup)
+    for name in ('ratelimit_memory', 'ratelimit_sqlite'):
+        if name in results and 'ratelimit_off' in results:
+            results[name]['overhead_ms'] = round(
+                results[name]['median_ms'] - results['ratelimit_off']['median_ms'], 3
+            )
+    ratelimit_path = f'{database_path}-ratelimit'
+    for path in (ratelimit_path, ratelimit_path + '-wal', ratelimit_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'git_revision': git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
+
+
+def compare(results, baseline, max_ratio):
+    """Return the scenarios whose median got slower than max_ratio times the baseline."""
+    regressions = {}
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous and previous['median_ms'] > 0:
+            ratio = current['median_ms'] / previous['median_ms']
+            if ratio > max_ratio:
+                regressions[name] = round(ratio, 2)
+    return regressions
+
+
+def run(scale, iterations, warmup, seed, only=None, database_path=None):
+    from benchmarks.datagen import generate, parse_scale
+
+    clients = parse_scale(scale)
+    workdir = None
+    if database_path is None:
+        workdir = tempfile.mkdtemp(prefix='health-bench-')
+        database_path = os.path.join(workdir, 'bench.db')
+    app = load_app(database_path)
+    started = time.perf_counter()
+    with app.app_context():
+        rows = generate(clients, seed=seed)
+    generate_seconds = time.perf_counter() - started
+
+    http = app.test_client()
+    token = http.post('/api/login', json={'username': 'doctor', 'password': 'password'}).json['access_token']
+    http.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    scenarios = build_scenarios(app, http, clients, seed)
+    results = {}
+    for name, request_for in scenarios.items():
+        if only and name not in only:
+            continue
+        results[name] = measure(http, request_for, iterations, warmup)
+    results.update(measure_rate_limiting(database_path, iterations, warmup, only))
+    database_bytes = sum(
+        os.path.getsize(path) for path in (database_path, database_path + '-wal') if os.path.exists(path)
+    )
+    if workdir is not None:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'scale': clients,
+        'rows': rows,
+        'generate_seconds': round(generate_seconds, 2),
+        'database_bytes': database_bytes,
+        'environment': environment(),
+        'results': results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='1k', help='1k, 10k, 100k, 1m or a number of clients')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', nargs='*', help='scenario names to run')
+    parser.add_argument('--database', help='database file to create (default: a temporary file)')
+    add_output_arguments(parser)
+    args = parser.parse_args(argv)
+
+    results = run(args.scale, args.iterations, args.warmup, args.seed, args.only, args.database)
+    return finish(results, args)
+
+
+def add_output_arguments(parser):
+    parser.add_argument('--output', help='write JSON results here instead of stdout')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare medians against')
+    parser.add_argument('--max-regression', type=float, default=1.25,
+                        help='fail when a median is more than this many times the baseline')
+
+
+def finish(results, args):
+    """Compare with --baseline, write the results and return the exit code."""
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        results['regressions'] = regressions
+        exit_code = 1 if regressions else 0
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Time how long the backend takes to start, the way gunicorn workers and pytest start it.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json
+
+Every sample is a fresh interpreter, so nothing is cached between runs:
+
+- import_app: importing app.py
+- create_app: building the app against an up-to-date database (a worker boot)
+- create_app_fresh_db: building the app against an empty database, running every migration
+- create_app_with_docs: create_app with SWAGGER_ENABLED, which imports flasgger
+- first_request: the first request served by a new app
+- apispec_first / apispec_cached: building the Swagger spec, then serving it again
+- test_collection: pytest --collect-only over tests/, including interpreter start
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_routes import add_output_arguments, environment, finish, summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(database_path, docs):
+    """Runs in a fresh interpreter; prints the timings of one boot as JSON."""
+    timings = {}
+    started = time.perf_counter()
+    from app import create_app
+    timings['import_app'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    app = create_app(
+        'production',
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{database_path}',
+        REQUEST_LOG_LEVEL='WARNING',
+        RATELIMIT_ENABLED=False,
+        AUTO_MIGRATE=True,
+        SWAGGER_ENABLED=docs
+    )
+    timings['create_app'] = time.perf_counter() - started
+
+    http = app.test_client()
+    started = time.perf_counter()
+    http.post('/api/login', json={'username': 'doctor', 'password': 'password'})
+    timings['first_request'] = time.perf_counter() - started
+
+    if docs:
+        for name in ('apispec_first', 'apispec_cached'):
+            started = time.perf_counter()
+            http.get('/apispec_1.json').get_data()
+            timings[name] = time.perf_counter() - started
+    print(json.dumps({name: seconds * 1000 for name, seconds in timings.items()}))
+
+
+def boot(database_path, docs=False):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_startup', '--child', database_path] + (['--docs'] if docs else []),
+        cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def collect_tests():
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'pytest', '--collect-only', '-q', 'tests'],
+        cwd=BACKEND_DIR, check=True, capture_output=True
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def run(iterations, only=None):
+    workdir = tempfile.mkdtemp(prefix='health-startup-')
+    samples = {}
+
+    def add(name, value):
+        if not only or name in only:
+            samples.setdefault(name, []).append(value)
+
+    try:
+        database_path = os.path.join(workdir, 'health.db')
+        boot(database_path)  # migrate once so later boots find the schema up to date
+        for i in range(iterations):
+            for name, value in boot(database_path).items():
+                add(name, value)
+            docs = boot(database_path, docs=True)
+            add('create_app_with_docs', docs['create_app'])
+            add('apispec_first', docs['apispec_first'])
+            add('apispec_cached', docs['apispec_cached'])
+            add('create_app_fresh_db', boot(os.path.join(workdir, f'fresh-{i}.db'))['create_app'])
+            if not only or 'test_collection' in only:
+                add('test_collection', collect_tests())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'environment': environment(),
+        'results': {name: summarize(values) for name, values in samples.items()}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--only', nargs='*', help='measurement names to report')
+    parser.add_argument('--child', metavar='DATABASE', help=argparse.SUPPRESS)
+    parser.add_argument('--docs', action='store_true', help=argparse.SUPPRESS)
+    add_output_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.child:
+        child(args.child, args.docs)
+        return 0
+    return finish(run(args.iterations, args.only), args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Synthetic patient data for benchmarks.
+
+Rows are inserted with Core executemany in large batches, so a million clients take
+minutes rather than hours. Output is deterministic for a given seed.
+"""
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert
+from models import db, Client, Program, client_programs
+from duplicates import index_clients
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+FIRST_NAMES = (
+    'Amina', 'Brian', 'Caroline', 'David', 'Esther', 'Francis', 'Grace', 'Hassan', 'Irene', 'James',
+    'Joyce', 'Kevin', 'Lucy', 'Mohamed', 'Naomi', 'Otieno', 'Purity', 'Peter', 'Rose', 'Samuel',
+    'Tabitha', 'Umar', 'Violet', 'Wanjiru', 'Yusuf', 'Zawadi'
+)
+LAST_NAMES = (
+    'Achieng', 'Barasa', 'Cheruiyot', 'Mwangi', 'Kamau', 'Kariuki', 'Kiprop', 'Mutua', 'Njoroge',
+    'Odhiambo', 'Ochieng', 'Omondi', 'Onyango', 'Otieno', 'Wafula', 'Wanjala', 'Waweru', 'Hussein',
+    'Abdi', 'Chebet', 'Jeptoo', 'Kibet', 'Korir', 'Langat', 'Macharia', 'Mutiso'
+)
+PROGRAM_NAMES = (
+    'TB', 'HIV', 'Malaria', 'Diabetes', 'Hypertension', 'Maternal Health', 'Child Immunization',
+    'Nutrition', 'Mental Health', 'Family Planning', 'Cervical Screening', 'Hepatitis B',
+    'Sickle Cell', 'Asthma', 'Eye Care', 'Dental', 'Oncology', 'Renal', 'Palliative Care', 'Geriatrics'
+)
+GENDERS = ('Male', 'Female', 'Other')
+
+BATCH_SIZE = 10_000
+
+
+def parse_scale(value):
+    """Accept a named scale (1k, 100k, 1m) or a plain number of clients."""
+    return SCALES.get(str(value).lower()) or int(value)
+
+
+def generate(clients, programs=len(PROGRAM_NAMES), enrollments_per_client=1.5, seed=42):
+    """Insert programs, clients and enrollments. Must run inside an app context."""
+    rng = random.Random(seed)
+    program_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(programs)]
+    db.session.execute(insert(Program), [
+        {'id': pid, 'name': PROGRAM_NAMES[i % len(PROGRAM_NAMES)] + ('' if i < len(PROGRAM_NAMES) else f' {i}'),
+         'description': 'Synthetic benchmark program'}
+        for i, pid in enumerate(program_ids)
+    ])
+    start = datetime(2022, 1, 1)
+    span_seconds = 3 * 365 * 24 * 3600
+    client_rows, membership_rows = [], []
+    enrolled = 0
+    for i in range(clients):
+        client_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        client_rows.append({
+            'id': client_id,
+            'first_name': first,
+            'last_name': last,
+            'email': f'{first.lower()}.{last.lower()}.{i}@example.org',
+            'phone': f'+2547{rng.randrange(10**8):08d}',
+            'date_of_birth': date(1940, 1, 1) + timedelta(days=rng.randrange(80 * 365)),
+            'address': f'{rng.randrange(1, 999)} Clinic Road',
+            'gender': rng.choice(GENDERS),
+            'emergency_contact': f'+2547{rng.randrange(10**8):08d}',
+            'created_at': start + timedelta(seconds=rng.randrange(span_seconds))
+        })
+        count = min(programs, int(rng.expovariate(1 / enrollments_per_client)))
+        for program_id in rng.sample(program_ids, count):
+            membership_rows.append({'client_id': client_id, 'program_id': program_id})
+        if len(client_rows) >= BATCH_SIZE:
+            enrolled += _flush(client_rows, membership_rows)
+    enrolled += _flush(client_rows, membership_rows)
+    return {'clients': clients, 'programs': programs, 'enrollments': enrolled}
+
+
+def _flush(client_rows, membership_rows):
+    if client_rows:
+        db.session.execute(insert(Client), client_rows)
+        index_clients(db.session.connection(), client_rows)
+    if membership_rows:
+        db.session.execute(insert(client_programs), membership_rows)
+    db.session.commit()
+    enrolled = len(membership_rows)
+    client_rows.clear()
+    membership_rows.clear()
+    return enrolled
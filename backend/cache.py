@@ -0,0 +1,202 @@
+import importlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+import json_provider
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300  # seconds
+
+# Cache keys used by the routes. Each includes the version of the resources the value
+# is built from (see versioning.py), so a write made by any worker process retires the
+# entries of every other process; stale ones just age out.
+def programs_key(version):
+    return f'programs:{version}'
+
+
+def client_key(client_id, version):
+    return f'client:{client_id}:{version}'
+
+
+class CacheBackend:
+    """Storage interface for Cache. Values are JSON-compatible and treated as read-only."""
+
+    def get(self, key):
+        """Return the stored value, or None when missing or expired."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, *keys):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU cache with a time-to-live on every entry."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(CacheBackend):
+    """Cache stored in a SQLite file so every gunicorn worker on a host shares it.
+
+    Invalidations made by one worker are seen by all of them. When the cache is full
+    the entries closest to expiry are evicted first.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_cache_entry_expires ON cache_entry (expires)')
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value FROM cache_entry WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        return json_provider.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        connection = self._connect()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)',
+            (key, json_provider.dumps(value), time.time() + ttl)
+        )
+        excess = connection.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0] - self.max_entries
+        if excess > 0:
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key IN '
+                '(SELECT key FROM cache_entry ORDER BY expires LIMIT ?)', (excess,)
+            )
+            self.evictions += excess
+
+    def delete(self, *keys):
+        connection = self._connect()
+        # Stay under SQLite's bound-parameter limit for large invalidations
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            connection.execute(f'DELETE FROM cache_entry WHERE key IN ({",".join("?" * len(chunk))})', chunk)
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache_entry')
+
+
+class Cache:
+    """Front end used by the routes: a backend plus hit/miss counters for this process."""
+
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_set(self, key, loader, ttl=None):
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            self.backend.set(key, value, self.ttl if ttl is None else ttl)
+        return value
+
+    def delete(self, *keys):
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': getattr(self.backend, 'evictions', None)
+        }
+
+
+def make_backend(spec, max_entries):
+    """Build a backend from CACHE_BACKEND.
+
+    'memory' (default) is per process, 'sqlite:///path/to/cache.db' is shared by every
+    process on the host, and 'package.module:ClassName' loads a custom CacheBackend
+    whose constructor accepts max_entries.
+    """
+    if not spec or spec == 'memory':
+        return MemoryCache(max_entries)
+    if spec.startswith('sqlite:///'):
+        return SQLiteCache(spec[len('sqlite:///'):], max_entries)
+    module_name, _, class_name = spec.partition(':')
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return backend_class(max_entries=max_entries)
+
+
+def init_app(app):
+    backend = make_backend(
+        app.config.get('CACHE_BACKEND', 'memory'),
+        app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+    )
+    app.extensions['cache'] = Cache(backend, app.config.get('CACHE_TTL', DEFAULT_TTL))
+
+
+def get_cache():
+    return current_app.extensions['cache']
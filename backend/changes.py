@@ -0,0 +1,121 @@
+from sqlalchemy import event, func, insert, inspect, literal, select
+from models import db, ChangeLog, Client, Program
+from pagination import PaginationError, decode_cursor, encode_cursor
+from serializers import IN_CHUNK_SIZE, client_columns, serialize_client_rows, serialize_programs, PROGRAM_FIELDS
+from versioning import MODEL_RESOURCES
+
+# Default and maximum number of changes per GET /api/changes page
+CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 5000
+
+_log = ChangeLog.__table__
+_LOG_COLUMNS = ['resource', 'resource_id', 'program_id', 'operation']
+
+
+def record_changes(connection, changes):
+    """Append (resource, resource_id, program_id, operation) tuples inside the caller's transaction."""
+    if changes:
+        connection.execute(insert(_log), [dict(zip(_LOG_COLUMNS, change)) for change in changes])
+
+
+def record(*changes):
+    """Log writes made outside the ORM unit of work, e.g. a Core bulk insert."""
+    record_changes(db.session.connection(), changes)
+
+
+def record_enrollments(operation, program_id, client_ids):
+    """Log one enrollment change per client id matched by the client_ids SELECT.
+
+    Runs as a single INSERT ... SELECT, so set-based enrollment writes stay set-based.
+    Call it before the write, while client_ids still selects the affected clients.
+    """
+    client_ids = client_ids.subquery()
+    rows = select(
+        literal('enrollment'), client_ids.c[0], literal(program_id), literal(operation)
+    )
+    db.session.execute(insert(_log).from_select(_LOG_COLUMNS, rows))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_flushed_changes(session, flush_context):
+    changes = []
+    for operation, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            resource = MODEL_RESOURCES.get(type(obj))
+            if resource is None:
+                continue
+            if operation != 'update' or session.is_modified(obj, include_collections=False):
+                changes.append((resource, obj.id, None, operation))
+            # Enrollments made through Client.programs
+            if isinstance(obj, Client) and operation != 'delete':
+                history = inspect(obj).attrs.programs.history
+                changes += [('enrollment', obj.id, program.id, 'insert') for program in history.added]
+                changes += [('enrollment', obj.id, program.id, 'delete') for program in history.deleted]
+    record_changes(session.connection(), changes)
+
+
+def parse_since(value):
+    values = decode_cursor(value)
+    if len(values) != 2 or values[0] != 'change' or not isinstance(values[1], int) or values[1] < 0:
+        raise PaginationError('Invalid cursor')
+    return values[1]
+
+
+def head_cursor():
+    """Cursor of the newest change; a client that takes it before a full download misses nothing."""
+    return encode_cursor('change', db.session.execute(select(func.coalesce(func.max(_log.c.id), 0))).scalar())
+
+
+def _load_current(model_ids):
+    """Current state of the changed clients and programs, keyed by (resource, id)."""
+    current = {}
+    client_ids = list(model_ids['client'])
+    for start in range(0, len(client_ids), IN_CHUNK_SIZE):
+        chunk = client_ids[start:start + IN_CHUNK_SIZE]
+        rows = db.session.execute(select(*client_columns()).where(Client.id.in_(chunk))).all()
+        current.update((('client', record['id']), record) for record in serialize_client_rows(rows))
+    program_ids = list(model_ids['program'])
+    for start in range(0, len(program_ids), IN_CHUNK_SIZE):
+        chunk = program_ids[start:start + IN_CHUNK_SIZE]
+        rows = db.session.execute(select(*(getattr(Program, f) for f in PROGRAM_FIELDS)).where(Program.id.in_(chunk)))
+        current.update((('program', record['id']), record) for record in serialize_programs(rows))
+    return current
+
+
+def changes_since(since, limit=CHANGES_LIMIT):
+    """One page of the change feed after the since sequence number, oldest first.
+
+    The latest insert or update of each client or program in the page carries the
+    resource's current state as data (None if it has since been deleted), so a sync
+    costs one request per page rather than one per changed row.
+    """
+    rows = db.session.execute(select(_log).where(_log.c.id > since).order_by(_log.c.id).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for row in rows:
+        if row.resource in ('client', 'program') and row.operation != 'delete':
+            latest[(row.resource, row.resource_id)] = row.id
+    model_ids = {'client': set(), 'program': set()}
+    for resource, resource_id in latest:
+        model_ids[resource].add(resource_id)
+    current = _load_current(model_ids)
+    changes = []
+    for row in rows:
+        change = {
+            'seq': row.id,
+            'resource': row.resource,
+            'id': row.resource_id,
+            'operation': row.operation,
+            'changed_at': row.changed_at
+        }
+        if row.resource == 'enrollment':
+            change['program_id'] = row.program_id
+        elif latest.get((row.resource, row.resource_id)) == row.id:
+            change['data'] = current.get((row.resource, row.resource_id))
+        changes.append(change)
+    return {
+        'changes': changes,
+        'next_cursor': encode_cursor('change', rows[-1].id if rows else since),
+        'has_more': has_more
+    }
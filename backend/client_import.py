@@ -0,0 +1,180 @@
+import codecs
+import csv
+import json
+import uuid
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from models import db, Client
+from changes import record
+from duplicates import index_clients
+from validation import ValidationError, validate_client
+from versioning import bump
+
+# Rows inserted per statement/commit unless the caller asks for another size
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+# Only the first errors are listed in the report; error_count always has the total
+MAX_REPORTED_ERRORS = 1000
+
+CSV_TYPES = ('text/csv', 'application/csv')
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+class ImportRequestError(ValueError):
+    """Raised when an import request has an unsupported format or options."""
+
+
+def detect_format(content_type, requested=None):
+    fmt = (requested or '').lower()
+    if not fmt:
+        mimetype = (content_type or '').split(';')[0].strip().lower()
+        if mimetype in CSV_TYPES:
+            fmt = 'csv'
+        elif mimetype in NDJSON_TYPES:
+            fmt = 'ndjson'
+    if fmt not in ('csv', 'ndjson'):
+        raise ImportRequestError('Upload must be CSV (text/csv) or NDJSON (application/x-ndjson)')
+    return fmt
+
+
+def parse_batch_size(value, default=DEFAULT_BATCH_SIZE):
+    if value in (None, ''):
+        return default
+    try:
+        batch_size = int(value)
+    except ValueError:
+        raise ImportRequestError('batch_size must be an integer')
+    if batch_size < 1:
+        raise ImportRequestError('batch_size must be at least 1')
+    return min(batch_size, MAX_BATCH_SIZE)
+
+
+def iter_records(stream, fmt):
+    """Yield (row_number, record_or_error) pairs without reading the whole body into memory.
+
+    Row numbers are 1-based data rows; the CSV header is not counted.
+    """
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if fmt == 'csv':
+        for number, record in enumerate(csv.DictReader(lines), start=1):
+            # Empty CSV cells mean "not provided", the same as a missing JSON key
+            yield number, {k: (v or None) for k, v in record.items() if k}
+        return
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, ValidationError('Invalid JSON')
+            continue
+        yield number, record if isinstance(record, dict) else ValidationError('Each line must be a JSON object')
+
+
+class ClientImporter:
+    """Validates streamed client records and inserts them in batches.
+
+    Duplicate emails are caught without a query per row: emails already seen in this
+    upload are tracked in memory and each batch is checked against the database with
+    a single IN query before it is inserted.
+
+    on_flush, if given, is called with the importer after each batch is committed.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, on_flush=None):
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+        self._seen_emails = set()
+        self._batch = []
+
+    def add_error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'message': message})
+
+    def add(self, row, record):
+        if isinstance(record, Exception):
+            self.add_error(row, str(record))
+            return
+        try:
+            values = validate_client(record)
+        except ValidationError as e:
+            self.add_error(row, str(e))
+            return
+        if values['email'] in self._seen_emails:
+            self.add_error(row, 'Duplicate email in upload')
+            return
+        self._seen_emails.add(values['email'])
+        self._batch.append((row, values))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        batch, self._batch = self._batch, []
+        if batch:
+            self._write(batch)
+        if self.on_flush:
+            self.on_flush(self)
+
+    def _write(self, batch):
+        existing = set(db.session.execute(
+            select(Client.email).where(Client.email.in_([values['email'] for _, values in batch]))
+        ).scalars())
+        rows = []
+        for row, values in batch:
+            if values['email'] in existing:
+                self.add_error(row, 'Email already exists')
+            else:
+                rows.append((row, values))
+        if not rows:
+            return
+        for _, values in rows:
+            # Ids are assigned here rather than by the column default so they can be logged
+            values.setdefault('id', str(uuid.uuid4()))
+        try:
+            db.session.execute(insert(Client), [values for _, values in rows])
+            record(*(('client', values['id'], None, 'insert') for _, values in rows))
+            index_clients(db.session.connection(), [values for _, values in rows])
+            bump('client')
+            db.session.commit()
+            self.inserted += len(rows)
+        except IntegrityError:
+            # Another writer inserted one of these emails since the check; isolate it
+            db.session.rollback()
+            self._insert_one_by_one(rows)
+
+    def _insert_one_by_one(self, rows):
+        for row, values in rows:
+            try:
+                db.session.execute(insert(Client), [values])
+                record(('client', values['id'], None, 'insert'))
+                index_clients(db.session.connection(), [values])
+                bump('client')
+                db.session.commit()
+                self.inserted += 1
+            except IntegrityError:
+                db.session.rollback()
+                self.add_error(row, 'Email already exists')
+
+    def run(self, records):
+        row = 0
+        try:
+            for row, record in records:
+                self.add(row, record)
+        except (UnicodeDecodeError, csv.Error) as e:
+            # The rest of the body is unreadable; keep what was valid up to here
+            self.add_error(row + 1, f'Could not read upload: {e}')
+        self.flush()
+        return self.report()
+
+    def report(self):
+        return {
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': self.errors
+        }
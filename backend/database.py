@@ -0,0 +1,70 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from models import db
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_sqlite_memory(uri):
+    url = make_url(uri)
+    return is_sqlite(uri) and url.database in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """SQLAlchemy engine options for the configured database.
+
+    File-based SQLite gets a connect timeout matching busy_timeout and a small pool so
+    each request reuses a connection. Server databases also get pre-ping and recycling
+    so connections dropped by the server or a proxy are replaced transparently.
+    In-memory SQLite is left to Flask-SQLAlchemy, which pins it to one connection.
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if is_sqlite_memory(uri):
+        return {}
+    options = {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+    }
+    if is_sqlite(uri):
+        options['connect_args'] = {
+            'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000,
+            'check_same_thread': False
+        }
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = config.get('DB_POOL_RECYCLE', 1800)
+    return options
+
+
+def sqlite_pragmas(config, memory=False):
+    pragmas = [
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 0))),
+    ]
+    # WAL needs a file; in-memory databases only support the MEMORY journal
+    if not memory:
+        pragmas.insert(0, ('journal_mode', config.get('SQLITE_JOURNAL_MODE', 'WAL')))
+    return pragmas
+
+
+def init_app(app):
+    """Bind db to the app with engine options and per-connection SQLite pragmas."""
+    options = dict(engine_options(app.config))
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    db.init_app(app)
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if not is_sqlite(uri):
+        return
+    pragmas = sqlite_pragmas(app.config, memory=is_sqlite_memory(uri))
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
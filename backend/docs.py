@@ -0,0 +1,23 @@
+def init_app(app):
+    """Serve the Swagger UI at /apidocs when SWAGGER_ENABLED is set.
+
+    flasgger is imported here rather than at module level because it pulls in jsonschema,
+    which no API request needs. The spec is built from the routes on its first request
+    and cached, since the routes do not change while the app runs.
+    """
+    if not app.config.get('SWAGGER_ENABLED', True):
+        return
+    from flasgger import Swagger
+
+    class CachedSwagger(Swagger):
+        def __init__(self, *args, **kwargs):
+            self._cached_specs = {}
+            super().__init__(*args, **kwargs)
+
+        def get_apispecs(self, endpoint='apispec_1'):
+            specs = self._cached_specs.get(endpoint)
+            if specs is None:
+                specs = self._cached_specs[endpoint] = super().get_apispecs(endpoint)
+            return specs
+
+    CachedSwagger(app)
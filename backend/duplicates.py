@@ -0,0 +1,225 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+import click
+from sqlalchemy import delete, event, insert, inspect, select
+from models import db, Client, ClientMatchKey
+
+# Candidates scored per lookup; only a name-only block of a very common name reaches it
+MAX_CANDIDATES = 500
+# Lowest score reported as a possible duplicate, and how many are reported
+MATCH_THRESHOLD = 0.75
+MAX_MATCHES = 5
+# Clients indexed per statement by rebuild_duplicate_index
+REBUILD_BATCH_SIZE = 5000
+
+KEY_FIELDS = ('first_name', 'last_name', 'date_of_birth')
+MATCH_FIELDS = ('id', 'first_name', 'last_name', 'email', 'phone', 'date_of_birth')
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'), **dict.fromkeys('CGJKQSXZ', '2'), **dict.fromkeys('DT', '3'),
+    'L': '4', **dict.fromkeys('MN', '5'), 'R': '6'
+}
+_key = ClientMatchKey.__table__
+
+
+@lru_cache(maxsize=4096)
+def fold(name):
+    """Uppercase ASCII letters of a name, with accents removed."""
+    ascii_name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode('ascii')
+    return re.sub('[^A-Z]', '', ascii_name.upper())
+
+
+def soundex(name):
+    """American Soundex code of a name ('Robert' and 'Rupert' are R163), or None."""
+    letters = fold(name)
+    if not letters:
+        return None
+    code, previous = letters[0], _SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter)
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W do not separate letters with the same code; vowels do
+        if letter not in 'HW':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def _name_codes(first_name, last_name):
+    """Distinct Soundex codes of both names, sorted so swapped names give the same pair."""
+    codes = sorted({code for code in (soundex(first_name), soundex(last_name)) if code})
+    return codes, ':'.join(codes)
+
+
+def blocking_keys(first_name, last_name, date_of_birth):
+    """Keys stored for a client.
+
+    dob:<date>:<code> for each name's Soundex code blocks clients born the same day with
+    a similar first or last name, so nicknames, misspellings, surname changes and
+    swapped names still meet. name:<codes> blocks every client with the same pair of
+    name codes, and nodob:<codes> only those without a date of birth.
+    """
+    codes, pair = _name_codes(first_name, last_name)
+    if not codes:
+        return set()
+    keys = {f'name:{pair}'}
+    if date_of_birth:
+        keys.update(f'dob:{date_of_birth.isoformat()}:{code}' for code in codes)
+    else:
+        keys.add(f'nodob:{pair}')
+    return keys
+
+
+def lookup_keys(first_name, last_name, date_of_birth):
+    """Keys whose blocks hold the candidates for a client.
+
+    With a date of birth: clients born that day with a similar name, and clients with a
+    similar name and no date of birth. Without one: every client with a similar name.
+    """
+    codes, pair = _name_codes(first_name, last_name)
+    if not codes:
+        return set()
+    if not date_of_birth:
+        return {f'name:{pair}'}
+    return {f'dob:{date_of_birth.isoformat()}:{code}' for code in codes} | {f'nodob:{pair}'}
+
+
+def index_clients(connection, clients, replace=False):
+    """Store the blocking keys of clients, given as mappings with id and KEY_FIELDS.
+
+    Runs inside the caller's transaction. Pass replace=True for clients that may
+    already be indexed.
+    """
+    clients = list(clients)
+    if replace:
+        remove_clients(connection, [c['id'] for c in clients])
+    rows = [
+        {'key': key, 'client_id': c['id']}
+        for c in clients
+        for key in blocking_keys(c['first_name'], c['last_name'], c['date_of_birth'])
+    ]
+    if rows:
+        connection.execute(insert(_key), rows)
+
+
+def remove_clients(connection, client_ids):
+    if client_ids:
+        connection.execute(delete(_key).where(_key.c.client_id.in_(client_ids)))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _index_flushed_clients(session, flush_context):
+    connection = session.connection()
+    index_clients(connection, [
+        {field: getattr(obj, field) for field in ('id',) + KEY_FIELDS}
+        for obj in session.new if isinstance(obj, Client)
+    ])
+    changed = [
+        obj for obj in session.dirty
+        if isinstance(obj, Client) and any(inspect(obj).attrs[f].history.has_changes() for f in KEY_FIELDS)
+    ]
+    index_clients(connection, [
+        {field: getattr(obj, field) for field in ('id',) + KEY_FIELDS} for obj in changed
+    ], replace=True)
+    remove_clients(connection, [obj.id for obj in session.deleted if isinstance(obj, Client)])
+
+
+def _normalize_phone(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    # Compare subscriber numbers so +254 712... and 0712... agree
+    return digits[-9:] if len(digits) >= 9 else None
+
+
+# Names repeat a lot, so most comparisons in a block have been made before
+@lru_cache(maxsize=16384)
+def _similarity(a, b):
+    a, b = fold(a), fold(b)
+    return SequenceMatcher(None, a, b).ratio() if a and b else 0.0
+
+
+def score(client, candidate):
+    """How likely candidate is the same person as client, from 0 to 1.
+
+    Names carry 0.6 (the better of the given order and swapped first/last names),
+    date of birth 0.3 and contact details 0.1. A missing date of birth or contact
+    detail scores half, since it neither confirms nor rules out a match.
+    """
+    names = max(
+        (_similarity(client['first_name'], candidate['first_name'])
+         + _similarity(client['last_name'], candidate['last_name'])) / 2,
+        (_similarity(client['first_name'], candidate['last_name'])
+         + _similarity(client['last_name'], candidate['first_name'])) / 2,
+    )
+    if client.get('date_of_birth') and candidate['date_of_birth']:
+        birth = 1.0 if client['date_of_birth'] == candidate['date_of_birth'] else 0.0
+    else:
+        birth = 0.5
+    phone, candidate_phone = _normalize_phone(client.get('phone')), _normalize_phone(candidate['phone'])
+    email = (client.get('email') or '').lower()
+    if (phone and phone == candidate_phone) or (email and email == (candidate['email'] or '').lower()):
+        contact = 1.0
+    elif phone and candidate_phone:
+        contact = 0.0
+    else:
+        contact = 0.5
+    return 0.6 * names + 0.3 * birth + 0.1 * contact
+
+
+def find_duplicates(client, exclude_id=None):
+    """Likely existing records of the client described by the client mapping.
+
+    client holds the register_client fields. Only clients sharing a blocking key are
+    read, with one query, so the cost depends on the size of the blocks and not on the
+    number of clients. Returns up to MAX_MATCHES matches, best first.
+    """
+    keys = lookup_keys(client['first_name'], client['last_name'], client.get('date_of_birth'))
+    if not keys:
+        return []
+    query = (
+        select(*(getattr(Client, f) for f in MATCH_FIELDS))
+        .join(ClientMatchKey, ClientMatchKey.client_id == Client.id)
+        .where(ClientMatchKey.key.in_(sorted(keys)))
+        .distinct()
+        .limit(MAX_CANDIDATES)
+    )
+    if exclude_id is not None:
+        query = query.where(Client.id != exclude_id)
+    matches = []
+    for row in db.session.execute(query):
+        candidate = dict(zip(MATCH_FIELDS, row))
+        candidate_score = score(client, candidate)
+        if candidate_score >= MATCH_THRESHOLD:
+            del candidate['phone']
+            candidate['score'] = round(candidate_score, 3)
+            matches.append(candidate)
+    matches.sort(key=lambda m: -m['score'])
+    return matches[:MAX_MATCHES]
+
+
+def rebuild_duplicate_index(connection):
+    """Recompute every client's blocking keys; runs in the caller's transaction."""
+    connection.execute(delete(_key))
+    columns = [Client.__table__.c[f] for f in ('id',) + KEY_FIELDS]
+    last_id = ''
+    while True:
+        rows = connection.execute(
+            select(*columns).where(Client.__table__.c.id > last_id)
+            .order_by(Client.__table__.c.id).limit(REBUILD_BATCH_SIZE)
+        ).mappings().all()
+        if not rows:
+            return
+        index_clients(connection, rows)
+        last_id = rows[-1]['id']
+
+
+def init_app(app):
+    @app.cli.command('rebuild-duplicate-index')
+    def rebuild_duplicate_index_command():
+        """Recompute the duplicate detection blocking keys of every client."""
+        with db.engine.begin() as connection:
+            rebuild_duplicate_index(connection)
+        click.echo('Duplicate detection index rebuilt')
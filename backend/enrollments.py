@@ -0,0 +1,77 @@
+from sqlalchemy import and_, delete, exists, insert, literal, select
+from models import db, Client, client_programs
+from changes import record_enrollments
+from versioning import bump
+
+# Keep IN lists under SQLite's historical 999 bound-parameter limit
+CHUNK_SIZE = 900
+# Largest number of client ids accepted by one bulk request
+MAX_BULK_CLIENTS = 10000
+
+
+def client_exists(client_id):
+    return db.session.execute(select(Client.id).where(Client.id == client_id)).first() is not None
+
+
+def _chunks(ids):
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _insert_ignoring_existing():
+    """INSERT for client_programs that skips rows which already exist.
+
+    The NOT EXISTS filter works on any database; on SQLite and PostgreSQL an ON CONFLICT
+    clause also covers a concurrent writer inserting the same row.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects import sqlite
+        return sqlite.insert(client_programs).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        # Imported on use: loading the PostgreSQL dialect adds tens of ms to every boot
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert(client_programs).on_conflict_do_nothing()
+    return insert(client_programs)
+
+
+def enroll(program_id, client_ids):
+    """Enroll existing clients in a program with set-based INSERT ... SELECT statements.
+
+    Ids of unknown clients and existing enrollments are skipped. No relationship
+    collections are loaded. Each new enrollment is added to the change log. Returns the
+    number of enrollments created; the caller commits.
+    """
+    changed = 0
+    for chunk in _chunks(client_ids):
+        already_enrolled = exists().where(and_(
+            client_programs.c.client_id == Client.id,
+            client_programs.c.program_id == program_id
+        ))
+        new_client_ids = select(Client.id).where(Client.id.in_(chunk), ~already_enrolled)
+        record_enrollments('insert', program_id, new_client_ids)
+        rows = new_client_ids.add_columns(literal(program_id))
+        result = db.session.execute(
+            _insert_ignoring_existing().from_select(['client_id', 'program_id'], rows)
+        )
+        changed += result.rowcount
+    if changed:
+        bump('client')
+    return changed
+
+
+def unenroll(program_id, client_ids):
+    """Remove clients from a program and log each removal.
+
+    Returns the number of enrollments deleted; the caller commits.
+    """
+    changed = 0
+    for chunk in _chunks(client_ids):
+        enrolled = and_(client_programs.c.program_id == program_id, client_programs.c.client_id.in_(chunk))
+        record_enrollments('delete', program_id, select(client_programs.c.client_id).where(enrolled))
+        result = db.session.execute(delete(client_programs).where(enrolled))
+        changed += result.rowcount
+    if changed:
+        bump('client')
+    return changed
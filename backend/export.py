@@ -0,0 +1,107 @@
+import csv
+import io
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from models import db, Client, client_programs
+from pagination import CLIENT_FIELDS, keyset_after_values
+from serializers import client_columns, serialize_client_rows
+import json_provider
+
+# Rows fetched per keyset query; memory use is bounded by this, not by the table size
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+_COLUMN_FIELDS = [f for f in CLIENT_FIELDS if f != 'programs']
+
+
+class ExportRequestError(ValueError):
+    """Raised when export filters or the format are invalid."""
+
+
+def parse_created_bound(value, name, end=False):
+    """Parse a created_from/created_to filter given as a date or an ISO datetime.
+
+    A bare date used as the upper bound covers the whole day.
+    """
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            bound = datetime(day.year, day.month, day.day)
+            return bound + timedelta(days=1) if end else bound
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportRequestError(f'{name} must be YYYY-MM-DD or an ISO datetime')
+
+
+def iter_client_chunks(program_id=None, created_from=None, created_to=None, chunk_size=None):
+    """Yield lists of client rows in (created_at, id) order, one keyset query per chunk.
+
+    Each chunk is a short, independent query, so no read transaction or server-side
+    cursor stays open for the length of the download.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    query = select(*client_columns())
+    if program_id:
+        query = query.where(Client.id.in_(
+            select(client_programs.c.client_id).where(client_programs.c.program_id == program_id)
+        ))
+    if created_from is not None:
+        query = query.where(Client.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Client.created_at < created_to)
+    query = query.order_by(Client.created_at, Client.id).limit(chunk_size)
+    last = None
+    while True:
+        page = query
+        if last is not None:
+            page = page.where(keyset_after_values(Client.created_at, Client.id, last.created_at, last.id))
+        rows = db.session.execute(page).all()
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+def iter_client_records(**filters):
+    for rows in iter_client_chunks(**filters):
+        yield from serialize_client_rows(rows)
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json_provider.dumps(record) + '\n'
+
+
+def _csv_value(value):
+    # Match the ISO dates of the JSON formats rather than str()'s space separator
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CLIENT_FIELDS)
+    for record in records:
+        programs = record.pop('programs')
+        writer.writerow([_csv_value(record[f]) for f in _COLUMN_FIELDS] + [';'.join(p['name'] for p in programs)])
+        # Hand the text over once a few rows have accumulated
+        if buffer.tell() >= 8192:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_clients(fmt, **filters):
+    if fmt not in EXPORT_FORMATS:
+        raise ExportRequestError('format must be ndjson or csv')
+    records = iter_client_records(**filters)
+    lines = csv_lines(records) if fmt == 'csv' else ndjson_lines(records)
+    return lines, EXPORT_FORMATS[fmt]
@@ -0,0 +1,16 @@
+# Picked up by gunicorn when started from this directory:
+#     gunicorn -w 4 'app:create_app()'
+
+
+def on_starting(server):
+    """Apply pending migrations once, in the master, before any worker boots."""
+    from app import create_app
+    from models import db
+    import schema
+
+    app = create_app(AUTO_MIGRATE=False)
+    with app.app_context():
+        applied = schema.upgrade_database()
+        # Workers must not inherit the master's connections
+        db.engine.dispose()
+    server.log.info('Applied migrations: %s', ', '.join(map(str, applied)) if applied else 'none pending')
@@ -0,0 +1,193 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+logger = logging.getLogger('health.requests')
+
+# Upper bounds of the latency histogram buckets, in milliseconds; the last bucket is open
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Number of recent requests kept for GET /api/metrics
+RECENT_REQUESTS = 100
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.response_bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, status, duration_ms, sql_count, sql_ms, size):
+        self.count += 1
+        if status >= 500:
+            self.errors += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.sql_count += sql_count
+        self.sql_ms += sql_ms
+        self.response_bytes += size or 0
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+
+    def to_dict(self):
+        count = self.count or 1
+        labels = [f'le_{bound}ms' for bound in LATENCY_BUCKETS_MS] + ['gt_5000ms']
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / count, 3),
+            'max_ms': round(self.max_ms, 3),
+            'avg_sql_count': round(self.sql_count / count, 3),
+            'avg_sql_ms': round(self.sql_ms / count, 3),
+            'avg_response_bytes': round(self.response_bytes / count, 1),
+            'latency_histogram': dict(zip(labels, self.buckets))
+        }
+
+
+class Metrics:
+    """Per-endpoint request statistics for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._recent = deque(maxlen=RECENT_REQUESTS)
+
+    def record(self, entry):
+        key = f"{entry['method']} {entry['route']}"
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = EndpointStats()
+            stats.record(entry['status'], entry['duration_ms'], entry['sql_count'], entry['sql_ms'], entry['bytes'])
+            self._recent.append(entry)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'endpoints': {key: stats.to_dict() for key, stats in sorted(self._endpoints.items())},
+                'recent': list(self._recent)
+            }
+
+
+def _redacted_request():
+    """What may be logged about a request: the route template and query parameter names.
+
+    Request bodies and parameter values can hold patient data, so they are never read
+    or recorded here.
+    """
+    rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+    return rule, sorted(request.args.keys())
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.sql_count = 0
+    g.sql_ms = 0.0
+
+
+def _after_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    route, params = _redacted_request()
+    entry = {
+        'method': request.method,
+        'route': route,
+        'params': params,
+        'status': response.status_code,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+        'sql_count': g.get('sql_count', 0),
+        'sql_ms': round(g.get('sql_ms', 0.0), 3),
+        # Streamed responses have no length until they are sent
+        'bytes': None if response.is_streamed else response.calculate_content_length()
+    }
+    current_app.extensions['metrics'].record(entry)
+    logger.info(json.dumps(entry, separators=(',', ':')))
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_request_context() and 'sql_count' in g:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is not None and has_request_context() and 'sql_count' in g:
+        g.sql_count += 1
+        g.sql_ms += (time.perf_counter() - started) * 1000
+
+
+_listener = None
+_listener_pid = None
+_queue_handler = None
+
+
+def _start_log_listener(level):
+    """Send request logs through a queue so the request thread never blocks on I/O.
+
+    The listener thread does not survive a fork, so a new one is started in each process.
+    """
+    global _listener, _listener_pid, _queue_handler
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+    if _queue_handler is not None:
+        logger.removeHandler(_queue_handler)
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    logger.addHandler(_queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def _stop_log_listener():
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+
+
+def _restart_log_listener():
+    # Workers forked from a preloaded master never run init_app themselves
+    if _listener is not None:
+        _start_log_listener(logger.level)
+
+
+atexit.register(_stop_log_listener)
+os.register_at_fork(after_in_child=_restart_log_listener)
+
+
+def init_app(app):
+    """Time every request, count its SQL statements and log it asynchronously.
+
+    Must run after the database has been bound to the app.
+    """
+    app.extensions['metrics'] = Metrics()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        engine = db.engine
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    _start_log_listener(app.config.get('REQUEST_LOG_LEVEL', 'INFO'))
+
+
+def get_metrics():
+    return current_app.extensions['metrics'].snapshot()
@@ -0,0 +1,437 @@
+import glob
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+from models import db, ClientMatchKey, Job, Program
+from client_import import ClientImporter, ImportRequestError, DEFAULT_BATCH_SIZE, detect_format, iter_records, parse_batch_size
+from duplicates import rebuild_duplicate_index
+from enrollments import CHUNK_SIZE, enroll, unenroll
+from export import (
+    EXPORT_CHUNK_SIZE, EXPORT_FORMATS, ExportRequestError, csv_lines, iter_client_records, ndjson_lines,
+    parse_created_bound
+)
+import search
+
+logger = logging.getLogger('health.jobs')
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 100
+DEFAULT_RETENTION_DAYS = 7
+# Largest number of client ids accepted by one enrollments job
+MAX_JOB_CLIENTS = 100000
+
+FINISHED = ('succeeded', 'failed', 'cancelled')
+JOB_FIELDS = (
+    'id', 'kind', 'status', 'progress', 'total', 'result', 'error', 'cancel_requested',
+    'created_at', 'started_at', 'finished_at'
+)
+
+
+class JobRequestError(ValueError):
+    """Raised when a job request names an unknown kind or has invalid options."""
+
+
+class JobQueueFull(Exception):
+    """Raised when JOB_MAX_PENDING jobs are already waiting to run."""
+
+
+class JobConflict(Exception):
+    """Raised when a finished job is cancelled or an unfinished one downloaded."""
+
+
+class JobCancelled(Exception):
+    """Raised at a progress checkpoint of a job whose cancellation was requested."""
+
+
+def _now():
+    return datetime.utcnow().replace(microsecond=0)
+
+
+def job_to_dict(job):
+    return {field: getattr(job, field) for field in JOB_FIELDS}
+
+
+def job_directory(app=None):
+    app = app or current_app
+    return app.config.get('JOB_DIR') or os.path.join(app.instance_path, 'jobs')
+
+
+def remove_job_files(job_id, directory=None):
+    for path in glob.glob(os.path.join(directory or job_directory(), f'{job_id}.*')):
+        os.remove(path)
+
+
+class JobContext:
+    """What a job handler sees: its params, its files and a progress checkpoint."""
+
+    def __init__(self, job_id, params, directory):
+        self.id = job_id
+        self.params = params
+        self.directory = directory
+
+    def path(self, suffix):
+        return os.path.join(self.directory, f'{self.id}{suffix}')
+
+    def progress(self, done, total=None):
+        """Record progress, then raise JobCancelled if cancellation was requested.
+
+        Commits the session, so handlers call it between their own commits.
+        """
+        values = {'progress': done}
+        if total is not None:
+            values['total'] = total
+        db.session.execute(update(Job).where(Job.id == self.id).values(**values))
+        db.session.commit()
+        if db.session.execute(select(Job.cancel_requested).where(Job.id == self.id)).scalar():
+            raise JobCancelled()
+
+
+# prepare(request, context) runs in the request that creates the job: it validates the
+# request, spools any upload into the job directory and returns the job's params.
+# run(context) runs on a worker thread and returns the job's result.
+JobKind = namedtuple('JobKind', ['prepare', 'run'])
+
+
+def prepare_import(request, context):
+    try:
+        fmt = detect_format(request.content_type, request.args.get('format'))
+        batch_size = parse_batch_size(
+            request.args.get('batch_size'), current_app.config.get('IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        )
+    except ImportRequestError as e:
+        raise JobRequestError(str(e))
+    with open(context.path('.upload'), 'wb') as upload:
+        shutil.copyfileobj(request.stream, upload)
+    return {'format': fmt, 'batch_size': batch_size}
+
+
+def run_import(context):
+    fmt = context.params['format']
+    path = context.path('.upload')
+    try:
+        # One record per line; a CSV value with a line break in it makes this an estimate
+        with open(path, 'rb') as upload:
+            total = sum(1 for line in upload if line.strip()) - (1 if fmt == 'csv' else 0)
+        context.progress(0, max(total, 0))
+        importer = ClientImporter(
+            context.params['batch_size'],
+            on_flush=lambda importer: context.progress(importer.inserted + importer.error_count)
+        )
+        with open(path, 'rb') as upload:
+            return importer.run(iter_records(upload, fmt))
+    finally:
+        os.remove(path)
+
+
+def _export_filters(params):
+    return {
+        'program_id': params.get('program_id'),
+        'created_from': parse_created_bound(params.get('created_from'), 'created_from'),
+        'created_to': parse_created_bound(params.get('created_to'), 'created_to', end=True)
+    }
+
+
+def _json_object(request):
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise JobRequestError('Request body must be a JSON object')
+    return data
+
+
+def prepare_export(request, context):
+    data = _json_object(request)
+    params = {key: data.get(key) for key in ('program_id', 'created_from', 'created_to')}
+    params['format'] = data.get('format', 'ndjson')
+    if params['format'] not in EXPORT_FORMATS:
+        raise JobRequestError('format must be ndjson or csv')
+    try:
+        _export_filters(params)
+    except ExportRequestError as e:
+        raise JobRequestError(str(e))
+    return params
+
+
+def run_export(context):
+    fmt = context.params['format']
+    written = 0
+
+    def counted(records):
+        nonlocal written
+        for record in records:
+            yield record
+            written += 1
+            # Chunks are fetched by separate queries, so committing here is safe
+            if written % EXPORT_CHUNK_SIZE == 0:
+                context.progress(written)
+
+    records = counted(iter_client_records(**_export_filters(context.params)))
+    lines = csv_lines(records) if fmt == 'csv' else ndjson_lines(records)
+    path = context.path(f'.{fmt}')
+    # Written under another name so a download never sees a partial file
+    with open(path + '.part', 'w', encoding='utf-8', newline='') as output:
+        output.writelines(lines)
+    os.replace(path + '.part', path)
+    context.progress(written, written)
+    return {'rows': written, 'format': fmt, 'download': f'/api/jobs/{context.id}/download'}
+
+
+def prepare_enrollments(request, context):
+    data = _json_object(request)
+    action = data.get('action', 'enroll')
+    if action not in ('enroll', 'unenroll'):
+        raise JobRequestError('action must be enroll or unenroll')
+    program_id = data.get('program_id')
+    if not isinstance(program_id, str) or db.session.get(Program, program_id) is None:
+        raise JobRequestError('program_id must be the ID of an existing program')
+    client_ids = data.get('client_ids')
+    if not isinstance(client_ids, list) or not client_ids or not all(isinstance(i, str) for i in client_ids):
+        raise JobRequestError('client_ids must be a non-empty list of client IDs')
+    if len(client_ids) > MAX_JOB_CLIENTS:
+        raise JobRequestError(f'At most {MAX_JOB_CLIENTS} client IDs per job')
+    # The ids stay out of the job row, which every progress poll reads
+    with open(context.path('.ids'), 'w') as ids:
+        json.dump(list(dict.fromkeys(client_ids)), ids)
+    return {'program_id': program_id, 'action': action}
+
+
+def run_enrollments(context):
+    path = context.path('.ids')
+    with open(path) as ids:
+        client_ids = json.load(ids)
+    change = enroll if context.params['action'] == 'enroll' else unenroll
+    changed = 0
+    context.progress(0, len(client_ids))
+    # One transaction per chunk, so a cancelled job keeps the chunks already done
+    for start in range(0, len(client_ids), CHUNK_SIZE):
+        chunk = client_ids[start:start + CHUNK_SIZE]
+        changed += change(context.params['program_id'], chunk)
+        db.session.commit()
+        context.progress(start + len(chunk))
+    os.remove(path)
+    return {'requested': len(client_ids), 'changed': changed}
+
+
+def prepare_nothing(request, context):
+    return {}
+
+
+def run_search_index(context):
+    enabled = search.install_search_index()
+    if enabled:
+        search.rebuild_search_index()
+    return {'enabled': enabled}
+
+
+def run_duplicate_index(context):
+    with db.engine.begin() as connection:
+        rebuild_duplicate_index(connection)
+        keys = connection.execute(select(func.count()).select_from(ClientMatchKey)).scalar()
+    return {'keys': keys}
+
+
+JOB_KINDS = {
+    'import': JobKind(prepare_import, run_import),
+    'export': JobKind(prepare_export, run_export),
+    'enrollments': JobKind(prepare_enrollments, run_enrollments),
+    'search_index': JobKind(prepare_nothing, run_search_index),
+    'duplicate_index': JobKind(prepare_nothing, run_duplicate_index),
+}
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobRunner:
+    """Runs queued jobs on a small thread pool in each worker process.
+
+    The job table is the queue: any process can take the oldest queued job, and a job
+    is claimed with a conditional UPDATE that also checks how many jobs are running,
+    so JOB_WORKERS bounds the running jobs across every process sharing the database.
+    No broker or separate worker process is needed; a job waiting for a free slot is
+    picked up when a running job finishes or on the next job request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config.get('JOB_WORKERS', DEFAULT_WORKERS)
+        self.max_pending = app.config.get('JOB_MAX_PENDING', DEFAULT_MAX_PENDING)
+        self.retention = timedelta(days=app.config.get('JOB_RETENTION_DAYS', DEFAULT_RETENTION_DAYS))
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._draining = 0
+        self._token = None
+
+    @property
+    def worker_name(self):
+        # The token tells this process apart from an earlier one that had the same pid
+        return f'{socket.gethostname()}:{os.getpid()}:{self._token}'
+
+    def _get_executor(self):
+        # A forked worker cannot use its parent's threads
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='job')
+            self._pid, self._draining, self._token = os.getpid(), 0, uuid.uuid4().hex[:8]
+        return self._executor
+
+    def enqueue(self, kind, request):
+        if kind not in JOB_KINDS:
+            raise JobRequestError(f"Unknown job kind '{kind}'; expected one of {', '.join(JOB_KINDS)}")
+        queued = db.session.execute(select(func.count()).select_from(Job).where(Job.status == 'queued')).scalar()
+        if queued >= self.max_pending:
+            raise JobQueueFull()
+        directory = job_directory(self.app)
+        os.makedirs(directory, exist_ok=True)
+        job_id = str(uuid.uuid4())
+        try:
+            params = JOB_KINDS[kind].prepare(request, JobContext(job_id, {}, directory))
+        except Exception:
+            remove_job_files(job_id, directory)
+            raise
+        job = Job(id=job_id, kind=kind, params=params)
+        db.session.add(job)
+        db.session.commit()
+        self.wake()
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or ask a running one to stop at its next checkpoint."""
+        now = _now()
+        cancelled = db.session.execute(
+            update(Job).where(Job.id == job_id, Job.status == 'queued')
+            .values(status='cancelled', cancel_requested=True, finished_at=now)
+        ).rowcount
+        if not cancelled:
+            requested = db.session.execute(
+                update(Job).where(Job.id == job_id, Job.status == 'running').values(cancel_requested=True)
+            ).rowcount
+            if not requested:
+                db.session.rollback()
+                raise JobConflict('Job has already finished')
+        db.session.commit()
+        if cancelled:
+            remove_job_files(job_id, job_directory(self.app))
+
+    def wake(self):
+        """Start a drain thread if the pool has room; safe to call on any request."""
+        with self._lock:
+            executor = self._get_executor()
+            if self._draining >= self.workers:
+                return
+            self._draining += 1
+        executor.submit(self._drain)
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._pid = None
+
+    def _drain(self):
+        try:
+            with self.app.app_context():
+                try:
+                    self.recover()
+                    while self._run_next():
+                        pass
+                finally:
+                    db.session.remove()
+        except Exception:
+            logger.exception('Job worker failed')
+        finally:
+            with self._lock:
+                self._draining -= 1
+
+    def _claim(self, job_id):
+        running = Job.__table__.alias('running_job')
+        running_count = select(func.count()).select_from(running).where(running.c.status == 'running').scalar_subquery()
+        claimed = db.session.execute(
+            update(Job).where(Job.id == job_id, Job.status == 'queued', running_count < self.workers)
+            .values(status='running', worker=self.worker_name, started_at=_now())
+        ).rowcount
+        db.session.commit()
+        return claimed == 1
+
+    def _run_next(self):
+        """Claim and run the oldest queued job; False when none can be claimed."""
+        job_id = db.session.execute(
+            select(Job.id).where(Job.status == 'queued').order_by(Job.created_at, Job.id).limit(1)
+        ).scalar()
+        if job_id is None:
+            return False
+        if not self._claim(job_id):
+            # Taken by another thread, or every slot is busy; only the first is worth a retry
+            return db.session.execute(select(Job.status).where(Job.id == job_id)).scalar() != 'queued'
+        self._run(db.session.get(Job, job_id))
+        return True
+
+    def _run(self, job):
+        job_id, kind = job.id, job.kind
+        context = JobContext(job_id, job.params, job_directory(self.app))
+        values = {}
+        try:
+            values = {'status': 'succeeded', 'result': JOB_KINDS[kind].run(context)}
+        except JobCancelled:
+            db.session.rollback()
+            values = {'status': 'cancelled'}
+        except Exception as e:
+            db.session.rollback()
+            logger.exception('Job %s (%s) failed', job_id, kind)
+            values = {'status': 'failed', 'error': str(e)}
+        # Unless recover() has already given up on it
+        db.session.execute(
+            update(Job).where(Job.id == job_id, Job.status == 'running').values(finished_at=_now(), **values)
+        )
+        db.session.commit()
+
+    def recover(self):
+        """Fail jobs left running by a process that died, and purge old finished jobs."""
+        host, pid = socket.gethostname(), str(os.getpid())
+        failed = []
+        for job_id, worker in db.session.execute(select(Job.id, Job.worker).where(Job.status == 'running')):
+            worker_host, worker_pid, token = ((worker or '').split(':') + ['', ''])[:3]
+            if worker_host != host or not worker_pid.isdigit():
+                # Only the host that ran a job can tell whether its process is gone
+                continue
+            if worker_pid == pid:
+                # Ours unless an earlier process had this pid, as in a restarted container
+                stale = token != self._token
+            else:
+                stale = not _process_alive(int(worker_pid))
+            if stale and db.session.execute(
+                update(Job).where(Job.id == job_id, Job.status == 'running')
+                .values(status='failed', error='Worker process exited before the job finished', finished_at=_now())
+            ).rowcount:
+                failed.append(job_id)
+        expired = db.session.execute(
+            select(Job.id).where(Job.status.in_(FINISHED), Job.finished_at < _now() - self.retention)
+        ).scalars().all()
+        if expired:
+            db.session.execute(delete(Job).where(Job.id.in_(expired)))
+        db.session.commit()
+        directory = job_directory(self.app)
+        for job_id in failed + expired:
+            remove_job_files(job_id, directory)
+
+
+def get_runner():
+    return current_app.extensions['jobs']
+
+
+def init_app(app):
+    app.extensions['jobs'] = JobRunner(app)
@@ -0,0 +1,106 @@
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime, time
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same output, only slower
+    orjson = None
+
+
+def _default(value):
+    """Types the stdlib encoder does not know, encoded the way orjson encodes them."""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _orjson_default(value):
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError
+
+
+def stdlib_dumps(obj, indent=None):
+    separators = None if indent else (',', ':')
+    return json.dumps(obj, default=_default, indent=indent, separators=separators).encode('utf-8')
+
+
+def orjson_dumps(obj, indent=None):
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+    return orjson.dumps(obj, default=_orjson_default, option=option)
+
+
+ENCODERS = {
+    'stdlib': (stdlib_dumps, json.loads),
+}
+if orjson is not None:
+    ENCODERS['orjson'] = (orjson_dumps, orjson.loads)
+
+
+def get_encoder(name='auto'):
+    """Return (dumps, loads) for JSON_ENCODER: 'auto' (orjson when installed), 'orjson' or 'stdlib'.
+
+    dumps returns UTF-8 bytes.
+    """
+    if not name or name == 'auto':
+        name = 'orjson' if 'orjson' in ENCODERS else 'stdlib'
+    if name not in ENCODERS:
+        raise ValueError(f'JSON_ENCODER {name!r} is not available; use one of {", ".join(ENCODERS)}')
+    return ENCODERS[name]
+
+
+# Module-level encoder for code that writes JSON outside a response (exports, the cache)
+_dumps, _loads = get_encoder()
+
+
+def dumps(obj):
+    return _dumps(obj).decode('utf-8')
+
+
+def loads(data):
+    return _loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson when installed, the stdlib otherwise.
+
+    Dates, datetimes and UUIDs are encoded natively, so serializers can hand over row
+    values without calling isoformat() on each one. Keys keep their insertion order.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.name = app.config.get('JSON_ENCODER', 'auto')
+        self._dumps, self._loads = get_encoder(self.name)
+
+    def _indent(self):
+        return 2 if self._app.debug else None
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps(obj, indent=kwargs.get('indent')).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return self._loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Hand the encoded bytes straight to the response without a str round trip
+        return self._app.response_class(
+            self._dumps(obj, indent=self._indent()) + b'\n', mimetype='application/json'
+        )
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
@@ -1,11 +1,22 @@
 import uuid
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import sqlite
 
 db = SQLAlchemy()
 
+# SQLite stores server_default timestamps as 'YYYY-MM-DD HH:MM:SS'. Bind values in the
+# same format so keyset comparisons on created_at match the stored text exactly.
+Timestamp = db.DateTime().with_variant(
+    sqlite.DATETIME(storage_format='%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d'),
+    'sqlite'
+)
+
 client_programs = db.Table('client_programs',
     db.Column('client_id', db.String(36), db.ForeignKey('client.id'), primary_key=True),
-    db.Column('program_id', db.String(36), db.ForeignKey('program.id'), primary_key=True)
+    db.Column('program_id', db.String(36), db.ForeignKey('program.id'), primary_key=True),
+    # The primary key serves client-first lookups; this one serves a program's members
+    db.Index('ix_client_programs_program_client', 'program_id', 'client_id')
 )
 
 class Client(db.Model):
@@ -18,12 +29,68 @@ class Client(db.Model):
     address = db.Column(db.String(200))
     gender = db.Column(db.String(20))
     emergency_contact = db.Column(db.String(100))  # Increased length
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    created_at = db.Column(Timestamp, server_default=db.func.now())
+    updated_at = db.Column(Timestamp, default=datetime.utcnow, server_default=db.func.now(), onupdate=db.func.now())
     programs = db.relationship('Program', secondary=client_programs, backref=db.backref('clients', lazy='dynamic'))
+    __table_args__ = (
+        # Listing and keyset pagination order by (created_at, id)
+        db.Index('ix_client_created_at_id', 'created_at', 'id'),
+        # Case-insensitive prefix search when full-text search is unavailable
+        db.Index('ix_client_lower_first_name', db.func.lower(first_name)),
+        db.Index('ix_client_lower_last_name', db.func.lower(last_name)),
+        db.Index('ix_client_lower_email', db.func.lower(email)),
+    )
 
 class Program(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
-    __table_args__ = (db.UniqueConstraint('name', name='uix_program_name'),)
\ No newline at end of file
+    created_at = db.Column(Timestamp, server_default=db.func.now())
+    updated_at = db.Column(Timestamp, default=datetime.utcnow, server_default=db.func.now(), onupdate=db.func.now())
+
+# One row per API resource, bumped on every write so GET handlers can answer
+# conditional requests without reading the resource itself
+class ResourceVersion(db.Model):
+    __tablename__ = 'resource_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(Timestamp, server_default=db.func.now())
+
+# Append-only feed of writes to clients, programs and enrollments, read by
+# GET /api/changes. The id is the sync cursor, so ids are never reused.
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+    id = db.Column(db.Integer, primary_key=True)
+    resource = db.Column(db.String(20), nullable=False)  # client, program or enrollment
+    resource_id = db.Column(db.String(36), nullable=False)  # the client id for enrollments
+    program_id = db.Column(db.String(36))  # enrollments only
+    operation = db.Column(db.String(10), nullable=False)  # insert, update or delete
+    changed_at = db.Column(Timestamp, server_default=db.func.now())
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# Blocking keys for duplicate detection (see duplicates.py). A registration is only
+# compared with the clients sharing one of its keys, never with the whole table.
+class ClientMatchKey(db.Model):
+    __tablename__ = 'client_match_key'
+    key = db.Column(db.String(60), primary_key=True)
+    client_id = db.Column(db.String(36), primary_key=True)
+    __table_args__ = (db.Index('ix_client_match_key_client', 'client_id'),)
+
+# Background jobs run by jobs.py. The row is the job's only shared state, so any
+# worker process can report on, cancel or pick up a job.
+class Job(db.Model):
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = db.Column(db.String(30), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed, cancelled
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)  # None until known
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    worker = db.Column(db.String(100))  # host:pid:token of the process running it
+    # Sub-second so jobs queued within the same second still run in order
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.now())
+    started_at = db.Column(Timestamp)
+    finished_at = db.Column(Timestamp)
+    __table_args__ = (db.Index('ix_job_status_created_at', 'status', 'created_at'),)
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+# Page size used when a caller asks for a page without giving a limit
+DEFAULT_LIMIT = 50
+# Hard cap so a single request can never pull the whole table
+MAX_LIMIT = 500
+
+# Client columns that can be requested through ?fields=
+CLIENT_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'phone', 'date_of_birth',
+    'address', 'gender', 'emergency_contact', 'created_at', 'programs'
+)
+
+
+class PaginationError(ValueError):
+    """Raised when a limit, cursor or fields parameter cannot be used."""
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def parse_fields(value, allowed=CLIENT_FIELDS):
+    # None means "every field", which keeps the original response shape
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise PaginationError(f'Unknown fields: {", ".join(unknown)}')
+    # The id is always returned so list rows can link to the profile
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+
+def encode_cursor(*values):
+    payload = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list):
+        raise PaginationError('Invalid cursor')
+    return values
+
+
+def client_cursor(client):
+    return encode_cursor(client.created_at.isoformat(), client.id)
+
+
+def keyset_after_values(created_at_col, id_col, created_at, last_id):
+    return or_(
+        created_at_col > created_at,
+        and_(created_at_col == created_at, id_col > last_id)
+    )
+
+
+def keyset_after(created_at_col, id_col, cursor):
+    """Return the WHERE clause selecting rows strictly after a (created_at, id) cursor."""
+    values = decode_cursor(cursor)
+    if len(values) != 2:
+        raise PaginationError('Invalid cursor')
+    try:
+        created_at = datetime.fromisoformat(values[0])
+    except (TypeError, ValueError):
+        raise PaginationError('Invalid cursor')
+    return keyset_after_values(created_at_col, id_col, created_at, str(values[1]))
@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import threading
+import time
+from flask import request
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from limits.storage import MovingWindowSupport, Storage
+
+# Limits of every route on its own, per client address
+DEFAULT_LIMITS = '200 per day;50 per hour'
+# Budget shared by all routes, per client address, in units of one profile read
+APPLICATION_LIMITS = '1000 per hour'
+
+# Cost of a request to the application budget by endpoint; anything not listed costs
+# 1. A client paging through the list or exporting the registry runs out sooner than
+# one opening profiles.
+ROUTE_COSTS = {
+    'get_all_clients': 5,
+    'search_clients': 2,
+    'get_clients_batch': 5,
+    'get_changes': 2,
+    'bulk_enrollments': 10,
+    'export_all_clients': 50,
+    'import_clients': 50,
+    'create_job': 50,
+}
+
+# Limits of single routes, counted on top of the default and application limits
+ROUTE_LIMITS = {
+    'login': '10 per minute',
+    'export_all_clients': '10 per hour',
+    'import_clients': '20 per hour',
+}
+
+# Limits that replace the default limits of a route: clients poll these until a job
+# finishes, which would run through the hourly default in minutes
+POLLING_LIMITS = {
+    'get_job': '120 per minute',
+}
+
+
+def request_cost():
+    return ROUTE_COSTS.get(request.endpoint, 1)
+
+
+def is_preflight():
+    """CORS preflights carry no credentials and do no work, so they are never counted."""
+    return request.method == 'OPTIONS'
+
+
+class SQLiteStorage(Storage, MovingWindowSupport):
+    """Rate limit counters in a SQLite file, shared by every gunicorn worker on a host.
+
+    Registered for sqlite:///path/to/ratelimit.db storage URIs. Supports the
+    fixed-window and moving-window strategies; moving-window entries carry their cost,
+    so a weighted hit is one row. Expired rows are swept every SWEEP_EVERY hits.
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+    SWEEP_EVERY = 1000
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri[len('sqlite:///'):]
+        self._local = threading.local()
+        self._hits = 0
+        connection = self._connect()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_counter '
+            '(key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires REAL NOT NULL)'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_entry '
+            '(key TEXT NOT NULL, expires REAL NOT NULL, amount INTEGER NOT NULL)'
+        )
+        # Covers the window query, so counting a window never reads the table
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS ix_rate_limit_entry_key ON rate_limit_entry (key, expires, amount)'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS ix_rate_limit_entry_expires ON rate_limit_entry (expires)')
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        return self._connect().execute(
+            'INSERT INTO rate_limit_counter (key, count, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'count = CASE WHEN expires <= ? THEN excluded.count ELSE count + excluded.count END, '
+            'expires = CASE WHEN expires <= ? THEN excluded.expires ELSE expires END '
+            'RETURNING count',
+            (key, amount, now + expiry, now, now)
+        ).fetchone()[0]
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT count FROM rate_limit_counter WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        now = time.time()
+        row = self._connect().execute(
+            'SELECT expires FROM rate_limit_counter WHERE key = ? AND expires > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self):
+        try:
+            self._connect().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        connection = self._connect()
+        cleared = connection.execute('DELETE FROM rate_limit_counter').rowcount
+        return cleared + connection.execute('DELETE FROM rate_limit_entry').rowcount
+
+    def clear(self, key):
+        connection = self._connect()
+        connection.execute('DELETE FROM rate_limit_counter WHERE key = ?', (key,))
+        connection.execute('DELETE FROM rate_limit_entry WHERE key = ?', (key,))
+
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        connection = self._connect()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front, so two workers cannot both see room
+        # for the last entry
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            used = connection.execute(
+                'SELECT COALESCE(SUM(amount), 0) FROM rate_limit_entry WHERE key = ? AND expires > ?', (key, now)
+            ).fetchone()[0]
+            acquired = used + amount <= limit
+            if acquired:
+                connection.execute(
+                    'INSERT INTO rate_limit_entry (key, expires, amount) VALUES (?, ?, ?)', (key, now + expiry, amount)
+                )
+            self._hits += 1
+            if self._hits % self.SWEEP_EVERY == 0:
+                connection.execute('DELETE FROM rate_limit_entry WHERE expires <= ?', (now,))
+                connection.execute('DELETE FROM rate_limit_counter WHERE expires <= ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return acquired
+
+    def get_moving_window(self, key, limit, expiry):
+        now = time.time()
+        oldest, used = self._connect().execute(
+            'SELECT MIN(expires), COALESCE(SUM(amount), 0) FROM rate_limit_entry WHERE key = ? AND expires > ?',
+            (key, now)
+        ).fetchone()
+        return (oldest - expiry, used) if used else (now, 0)
+
+
+def storage_uri(app):
+    """RATELIMIT_STORAGE_URI, with relative sqlite paths placed in the instance folder."""
+    uri = app.config.get('RATELIMIT_STORAGE_URI') or 'memory://'
+    if uri.startswith('sqlite:///') and not os.path.isabs(uri[len('sqlite:///'):]):
+        os.makedirs(app.instance_path, exist_ok=True)
+        uri = 'sqlite:///' + os.path.join(app.instance_path, uri[len('sqlite:///'):])
+    return uri
+
+
+def init_app(app):
+    # One limiter per app: Flask-Limiter keeps its storage and enabled flag on the
+    # instance, so a shared one would carry them from one app to the next
+    limiter = Limiter(
+        key_func=get_remote_address,
+        default_limits=[app.config.get('RATELIMIT_DEFAULT') or DEFAULT_LIMITS],
+        application_limits=[app.config.get('RATELIMIT_APPLICATION') or APPLICATION_LIMITS],
+        application_limits_cost=request_cost,
+        storage_uri=storage_uri(app) if app.config.get('RATELIMIT_ENABLED', True) else None
+    )
+    limiter.request_filter(is_preflight)
+    limiter.init_app(app)
+    app.extensions['rate_limiter'] = limiter
+
+
+def apply_route_limits(app):
+    """Attach ROUTE_LIMITS and POLLING_LIMITS to the registered views; call after register_routes."""
+    limiter = app.extensions['rate_limiter']
+    for endpoint, value in ROUTE_LIMITS.items():
+        view = app.view_functions[endpoint]
+        app.view_functions[endpoint] = limiter.limit(value, override_defaults=False)(view)
+    for endpoint, value in POLLING_LIMITS.items():
+        view = app.view_functions[endpoint]
+        app.view_functions[endpoint] = limiter.limit(value, override_defaults=True)(view)
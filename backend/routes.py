@@ -1,22 +1,120 @@
-from flask import request, jsonify
+import hmac
+import os
+import bcrypt
+from flask import Response, abort, current_app, request, jsonify, send_file, stream_with_context
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token
-from datetime import datetime
-from models import db, Client, Program
-import re
+from models import db, Client, Job, Program
+from pagination import (
+    PaginationError, parse_limit, parse_fields, client_cursor, keyset_after,
+    encode_cursor, decode_cursor
+)
+from serializers import (
+    MAX_BATCH_CLIENTS, client_columns, load_client, load_clients, load_program_catalogue, serialize_client_rows
+)
+from cache import client_key, get_cache, programs_key
+from instrumentation import get_metrics
+from enrollments import MAX_BULK_CLIENTS, client_exists, enroll, unenroll
+import search
+from stats import MAX_DAYS, dashboard_stats
+from export import EXPORT_FORMATS, ExportRequestError, export_clients, parse_created_bound
+from validation import ValidationError, validate_client
+from duplicates import find_duplicates
+from versioning import conditional, resource_version
+from changes import CHANGES_LIMIT, MAX_CHANGES_LIMIT, changes_since, head_cursor, parse_since
+from client_import import (
+    ClientImporter, ImportRequestError, DEFAULT_BATCH_SIZE, detect_format, iter_records, parse_batch_size
+)
+from jobs import JobConflict, JobQueueFull, JobRequestError, get_runner, job_directory, job_to_dict
 from sqlalchemy.exc import IntegrityError
 
 # Initialize JWT (will be attached to the app in app.py)
 jwt = JWTManager()
 
+def list_clients(query):
+    """Serialize a client query, paginated by (created_at, id) when limit or cursor is given.
+
+    Without limit/cursor the full list is returned as a bare JSON array, which is what
+    existing callers expect. With either parameter the response becomes
+    {'items': [...], 'next_cursor': ...} and next_cursor is None on the last page.
+    """
+    fields = parse_fields(request.args.get('fields'))
+    paginate = 'limit' in request.args or 'cursor' in request.args
+    if not paginate:
+        client_ids = query.with_entities(Client.id).statement
+        rows = query.with_entities(*client_columns(fields)).all()
+        return jsonify(serialize_client_rows(rows, fields, client_ids))
+    limit = parse_limit(request.args.get('limit'))
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(keyset_after(Client.created_at, Client.id, cursor))
+    # Fetch one extra row to know whether another page exists
+    rows = (
+        query.with_entities(*client_columns(fields, extra=('created_at',)))
+        .order_by(Client.created_at, Client.id).limit(limit + 1).all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        'items': serialize_client_rows(rows, fields),
+        'next_cursor': client_cursor(rows[-1]) if has_more else None
+    })
+
+def list_ranked_clients(expression):
+    """Serialize full-text search results, best match first.
+
+    Ranked results cannot be keyset paginated by created_at, so the cursor carries the
+    offset of the next page instead. Without limit/cursor a bare array of the top
+    search.SEARCH_LIMIT matches is returned.
+    """
+    fields = parse_fields(request.args.get('fields'))
+    limit = parse_limit(request.args.get('limit'), search.SEARCH_LIMIT, search.MAX_SEARCH_LIMIT)
+    paginate = 'limit' in request.args or 'cursor' in request.args
+    offset = 0
+    if request.args.get('cursor'):
+        values = decode_cursor(request.args['cursor'])
+        if len(values) != 2 or values[0] != 'rank' or not isinstance(values[1], int) or values[1] < 0:
+            raise PaginationError('Invalid cursor')
+        offset = values[1]
+    query = search.ranked_query(expression).with_entities(*client_columns(fields))
+    rows = query.offset(offset).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not paginate:
+        return jsonify(serialize_client_rows(rows, fields))
+    return jsonify({
+        'items': serialize_client_rows(rows, fields),
+        'next_cursor': encode_cursor('rank', offset + limit) if has_more else None
+    })
+
+def program_catalogue():
+    """All programs as dicts, served from the cache until a program is written."""
+    return get_cache().get_or_set(programs_key(resource_version('program')), load_program_catalogue)
+
+def find_program(program_id):
+    return next((p for p in program_catalogue() if p['id'] == program_id), None)
+
+def client_profile(client_id):
+    """A client's serialized profile, served from the cache; None if there is no such client.
+
+    Any client or program write changes the key, as it changes the ETag.
+    """
+    return get_cache().get_or_set(
+        client_key(client_id, resource_version('client', 'program')), lambda: load_client(client_id)
+    )
+
+def check_credentials(username, password):
+    """Check the doctor's login against DOCTOR_USERNAME and DOCTOR_PASSWORD_HASH."""
+    if not isinstance(password, str) or username != current_app.config['DOCTOR_USERNAME']:
+        return False
+    password_hash = current_app.config.get('DOCTOR_PASSWORD_HASH')
+    if not password_hash:
+        return hmac.compare_digest(password.encode('utf-8'), b'password')
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
 def register_routes(app):
     # Attach JWT to the app
     jwt.init_app(app)
 
-    # Log all incoming requests for debugging
-    @app.before_request
-    def log_request():
-        print(f"Request: {request.method} {request.path} {request.get_json(silent=True)}")
-
     @app.route('/api/login', methods=['POST', 'OPTIONS'])
     def login():
         if request.method == 'OPTIONS':
@@ -26,7 +124,7 @@ def register_routes(app):
             return jsonify({'message': 'Username and password are required'}), 422
         username = data.get('username')
         password = data.get('password')
-        if username == 'doctor' and password == 'password':
+        if check_credentials(username, password):
             access_token = create_access_token(identity=username)
             return jsonify(access_token=access_token), 200
         return jsonify({'message': 'Invalid credentials'}), 401
@@ -36,133 +134,138 @@ def register_routes(app):
     def register_client():
         if request.method == 'OPTIONS':
             return jsonify({}), 200
-        data = request.get_json()
-        if not data:
-            return jsonify({'message': 'No data provided'}), 422
-        required_fields = ['first_name', 'last_name', 'email']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'message': f'Missing required field: {field}'}), 422
-        if not re.match(r'^[\w\.-]+@[\w\.-]+\.\w+$', data['email']):
-            return jsonify({'message': 'Invalid email format'}), 422
         try:
-            dob = datetime.strptime(data['date_of_birth'], '%Y-%m-%d') if data.get('date_of_birth') else None
-        except ValueError:
-            return jsonify({'message': 'Invalid date_of_birth format. Use YYYY-MM-DD'}), 422
+            values = validate_client(request.get_json(silent=True))
+        except ValidationError as e:
+            return jsonify({'message': str(e)}), 422
         try:
-            new_client = Client(
-                first_name=data['first_name'],
-                last_name=data['last_name'],
-                email=data['email'],
-                phone=data.get('phone'),
-                date_of_birth=dob,
-                address=data.get('address'),
-                gender=data.get('gender'),
-                emergency_contact=data.get('emergency_contact')
-            )
+            new_client = Client(**values)
             db.session.add(new_client)
             db.session.commit()
-            return jsonify({'id': new_client.id, 'message': 'Client registered successfully'}), 201
+            return jsonify({
+                'id': new_client.id,
+                'message': 'Client registered successfully',
+                # Existing records that are likely the same patient, for the user to review
+                'possible_duplicates': find_duplicates(values, exclude_id=new_client.id)
+            }), 201
         except IntegrityError:
             db.session.rollback()
             return jsonify({'message': 'Email already exists'}), 422
 
+    @app.route('/api/clients/import', methods=['POST', 'OPTIONS'])
+    @jwt_required()
+    def import_clients():
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        try:
+            fmt = detect_format(request.content_type, request.args.get('format'))
+            batch_size = parse_batch_size(
+                request.args.get('batch_size'), app.config.get('IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+            )
+        except ImportRequestError as e:
+            return jsonify({'message': str(e)}), 422
+        report = ClientImporter(batch_size).run(iter_records(request.stream, fmt))
+        return jsonify(report), 200
+
     @app.route('/api/clients', methods=['GET', 'OPTIONS'])
     @jwt_required()
+    @conditional('client', 'program')
     def get_all_clients():
         if request.method == 'OPTIONS':
             return jsonify({}), 200
         try:
-            clients = Client.query.all()
-            return jsonify([{
-                'id': client.id,
-                'first_name': client.first_name,
-                'last_name': client.last_name,
-                'email': client.email,
-                'phone': client.phone,
-                'date_of_birth': client.date_of_birth.isoformat() if client.date_of_birth else None,
-                'address': getattr(client, 'address', None),
-                'gender': getattr(client, 'gender', None),
-                'emergency_contact': getattr(client, 'emergency_contact', None),
-                'created_at': client.created_at.isoformat(),
-                'programs': [{'id': p.id, 'name': p.name} for p in client.programs]
-            } for client in clients]), 200
+            return list_clients(Client.query), 200
+        except PaginationError as e:
+            return jsonify({'message': str(e)}), 422
         except Exception as e:
             return jsonify({'message': f'Failed to fetch clients: {str(e)}'}), 500
 
+    @app.route('/api/clients/export', methods=['GET', 'OPTIONS'])
+    @jwt_required()
+    def export_all_clients():
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        fmt = request.args.get('format', 'ndjson')
+        try:
+            lines, mimetype = export_clients(
+                fmt,
+                program_id=request.args.get('program_id'),
+                created_from=parse_created_bound(request.args.get('created_from'), 'created_from'),
+                created_to=parse_created_bound(request.args.get('created_to'), 'created_to', end=True)
+            )
+        except ExportRequestError as e:
+            return jsonify({'message': str(e)}), 422
+        response = Response(stream_with_context(lines), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=clients.{fmt}'
+        return response
+
     @app.route('/api/clients/search', methods=['GET', 'OPTIONS'])
     @jwt_required()
+    @conditional('client', 'program')
     def search_clients():
         if request.method == 'OPTIONS':
             return jsonify({}), 200
         query = request.args.get('q', '')
         try:
-            clients = Client.query.filter(
-                (Client.first_name.ilike(f'%{query}%')) |
-                (Client.last_name.ilike(f'%{query}%')) |
-                (Client.email.ilike(f'%{query}%'))
-            ).all()
-            return jsonify([{
-                'id': client.id,
-                'first_name': client.first_name,
-                'last_name': client.last_name,
-                'email': client.email,
-                'phone': client.phone,
-                'date_of_birth': client.date_of_birth.isoformat() if client.date_of_birth else None,
-                'address': getattr(client, 'address', None),
-                'gender': getattr(client, 'gender', None),
-                'emergency_contact': getattr(client, 'emergency_contact', None),
-                'created_at': client.created_at.isoformat(),
-                'programs': [{'id': p.id, 'name': p.name} for p in client.programs]
-            } for client in clients]), 200
+            expression = search.match_expression(query)
+            if expression and search.search_enabled():
+                return list_ranked_clients(expression), 200
+            clients = Client.query
+            condition = search.prefix_filter(query)
+            if condition is not None:
+                clients = clients.filter(condition)
+            return list_clients(clients), 200
+        except PaginationError as e:
+            return jsonify({'message': str(e)}), 422
         except Exception as e:
             return jsonify({'message': f'Search failed: {str(e)}'}), 500
 
+    # Several profiles in one round trip, in the order requested
+    @app.route('/api/clients/batch', methods=['POST', 'OPTIONS'])
+    @jwt_required()
+    def get_clients_batch():
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'message': 'Request body must be a JSON object'}), 422
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+            return jsonify({'message': 'ids must be a non-empty list of client IDs'}), 422
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > MAX_BATCH_CLIENTS:
+            return jsonify({'message': f'At most {MAX_BATCH_CLIENTS} client IDs per request'}), 422
+        profiles = load_clients(ids)
+        return jsonify({
+            'clients': [profiles[i] for i in ids if i in profiles],
+            'missing': [i for i in ids if i not in profiles]
+        }), 200
+
     @app.route('/api/clients/<id>', methods=['GET', 'PUT', 'OPTIONS'])
     @jwt_required()
+    @conditional('client', 'program')
     def client(id):
         if request.method == 'OPTIONS':
             return jsonify({}), 200
-        client = Client.query.get_or_404(id)
         if request.method == 'GET':
-            return jsonify({
-                'id': client.id,
-                'first_name': client.first_name,
-                'last_name': client.last_name,
-                'email': client.email,
-                'phone': client.phone,
-                'date_of_birth': client.date_of_birth.isoformat() if client.date_of_birth else None,
-                'address': getattr(client, 'address', None),
-                'gender': getattr(client, 'gender', None),
-                'emergency_contact': getattr(client, 'emergency_contact', None),
-                'created_at': client.created_at.isoformat(),
-                'programs': [{'id': p.id, 'name': p.name} for p in client.programs]
-            }), 200
+            profile = client_profile(id)
+            if profile is None:
+                abort(404)
+            return jsonify(profile), 200
         elif request.method == 'PUT':
-            data = request.get_json()
-            if not data:
-                return jsonify({'message': 'No data provided'}), 422
-            required_fields = ['first_name', 'last_name', 'email']
-            for field in required_fields:
-                if not data.get(field):
-                    return jsonify({'message': f'Missing required field: {field}'}), 422
-            if not re.match(r'^[\w\.-]+@[\w\.-]+\.\w+$', data['email']):
-                return jsonify({'message': 'Invalid email format'}), 422
+            client = Client.query.get_or_404(id)
             try:
-                dob = datetime.strptime(data['date_of_birth'], '%Y-%m-%d') if data.get('date_of_birth') else None
-            except ValueError:
-                return jsonify({'message': 'Invalid date_of_birth format. Use YYYY-MM-DD'}), 422
+                values = validate_client(request.get_json(silent=True))
+            except ValidationError as e:
+                return jsonify({'message': str(e)}), 422
             try:
-                client.first_name = data['first_name']
-                client.last_name = data['last_name']
-                client.email = data['email']
-                client.phone = data.get('phone')
-                client.date_of_birth = dob
-                client.address = data.get('address')
-                client.gender = data.get('gender')
-                client.emergency_contact = data.get('emergency_contact')
+                for field, value in values.items():
+                    setattr(client, field, value)
                 db.session.commit()
-                return jsonify({'message': 'Client updated successfully'}), 200
+                return jsonify({
+                    'message': 'Client updated successfully',
+                    'possible_duplicates': find_duplicates(values, exclude_id=id)
+                }), 200
             except IntegrityError:
                 db.session.rollback()
                 return jsonify({'message': 'Email already exists'}), 422
@@ -175,7 +278,7 @@ def register_routes(app):
         data = request.get_json()
         if not data or not data.get('name'):
             return jsonify({'message': 'Program name is required'}), 422
-        if Program.query.filter_by(name=data['name']).first():
+        if any(p['name'] == data['name'] for p in program_catalogue()):
             return jsonify({'message': 'A program with this name already exists'}), 422
         try:
             new_program = Program(
@@ -191,30 +294,72 @@ def register_routes(app):
 
     @app.route('/api/programs', methods=['GET', 'OPTIONS'])
     @jwt_required()
+    @conditional('program')
     def get_programs():
         if request.method == 'OPTIONS':
             return jsonify({}), 200
-        programs = Program.query.all()
-        return jsonify([{
-            'id': program.id,
-            'name': program.name,
-            'description': program.description,
-            'created_at': program.created_at.isoformat() if program.created_at else None
-        } for program in programs]), 200
+        return jsonify(program_catalogue()), 200
+
+    # Not @conditional: the 30 day counts and histogram move with the clock, not with writes
+    @app.route('/api/stats', methods=['GET', 'OPTIONS'])
+    @jwt_required()
+    def get_stats():
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        days = request.args.get('days')
+        if days is not None:
+            try:
+                days = int(days)
+            except ValueError:
+                days = 0
+            if days < 1:
+                return jsonify({'message': 'days must be a positive integer'}), 422
+            days = min(days, MAX_DAYS)
+        return jsonify(dashboard_stats(days)), 200
+
+    @app.route('/api/cache/stats', methods=['GET', 'OPTIONS'])
+    @jwt_required()
+    def cache_stats():
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        return jsonify(get_cache().stats()), 200
+
+    @app.route('/api/metrics', methods=['GET', 'OPTIONS'])
+    @jwt_required()
+    def metrics():
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        return jsonify({**get_metrics(), 'cache': get_cache().stats()}), 200
+
+    @app.route('/api/changes', methods=['GET', 'OPTIONS'])
+    @jwt_required()
+    def get_changes():
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        since = request.args.get('since')
+        try:
+            limit = parse_limit(request.args.get('limit'), CHANGES_LIMIT, MAX_CHANGES_LIMIT)
+            # Without since, only hand out the current position to sync from
+            if not since:
+                return jsonify({'changes': [], 'next_cursor': head_cursor(), 'has_more': False}), 200
+            return jsonify(changes_since(parse_since(since), limit)), 200
+        except PaginationError as e:
+            return jsonify({'message': str(e)}), 422
 
     @app.route('/api/clients/<client_id>/programs', methods=['POST', 'OPTIONS'])
     @jwt_required()
     def enroll_client(client_id):
         if request.method == 'OPTIONS':
             return jsonify({}), 200
-        client = Client.query.get_or_404(client_id)
+        if not client_exists(client_id):
+            abort(404)
         data = request.get_json()
         if not data or not data.get('program_id'):
             return jsonify({'message': 'Program ID is required'}), 422
-        program = Program.query.get_or_404(data['program_id'])
-        if program in client.programs:
+        if find_program(data['program_id']) is None:
+            abort(404)
+        if not enroll(data['program_id'], [client_id]):
             return jsonify({'message': 'Client already enrolled in this program'}), 422
-        client.programs.append(program)
         db.session.commit()
         return jsonify({'message': 'Client enrolled successfully'}), 200
 
@@ -223,10 +368,87 @@ def register_routes(app):
     def unenroll_client(client_id, program_id):
         if request.method == 'OPTIONS':
             return jsonify({}), 200
-        client = Client.query.get_or_404(client_id)
-        program = Program.query.get_or_404(program_id)
-        if program in client.programs:
-            client.programs.remove(program)
+        if not client_exists(client_id) or find_program(program_id) is None:
+            abort(404)
+        if unenroll(program_id, [client_id]):
             db.session.commit()
             return jsonify({'message': 'Client unenrolled successfully'}), 200
-        return jsonify({'message': 'Client is not enrolled in this program'}), 400
\ No newline at end of file
+        return jsonify({'message': 'Client is not enrolled in this program'}), 400
+
+    @app.route('/api/programs/<program_id>/enrollments', methods=['POST', 'DELETE', 'OPTIONS'])
+    @jwt_required()
+    def bulk_enrollments(program_id):
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        if find_program(program_id) is None:
+            abort(404)
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'message': 'Request body must be a JSON object'}), 422
+        client_ids = data.get('client_ids')
+        if not isinstance(client_ids, list) or not client_ids or not all(isinstance(i, str) for i in client_ids):
+            return jsonify({'message': 'client_ids must be a non-empty list of client IDs'}), 422
+        if len(client_ids) > MAX_BULK_CLIENTS:
+            return jsonify({'message': f'At most {MAX_BULK_CLIENTS} client IDs per request'}), 422
+        if request.method == 'POST':
+            changed = enroll(program_id, client_ids)
+        else:
+            changed = unenroll(program_id, client_ids)
+        db.session.commit()
+        return jsonify({'requested': len(set(client_ids)), 'changed': changed}), 200
+
+    @app.route('/api/jobs/<kind>', methods=['POST', 'OPTIONS'])
+    @jwt_required()
+    def create_job(kind):
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        try:
+            job = get_runner().enqueue(kind, request)
+        except JobRequestError as e:
+            return jsonify({'message': str(e)}), 422
+        except JobQueueFull:
+            return jsonify({'message': 'Too many jobs waiting; try again later'}), 503
+        return jsonify(job_to_dict(job)), 202, {'Location': f'/api/jobs/{job.id}'}
+
+    @app.route('/api/jobs/<job_id>', methods=['GET', 'OPTIONS'])
+    @jwt_required()
+    def get_job(job_id):
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        job = db.session.get(Job, job_id)
+        if job is None:
+            abort(404)
+        # Picks up jobs left waiting by a process that has since stopped
+        if job.status == 'queued':
+            get_runner().wake()
+        return jsonify(job_to_dict(job)), 200
+
+    @app.route('/api/jobs/<job_id>/cancel', methods=['POST', 'OPTIONS'])
+    @jwt_required()
+    def cancel_job(job_id):
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        if db.session.get(Job, job_id) is None:
+            abort(404)
+        try:
+            get_runner().cancel(job_id)
+        except JobConflict as e:
+            return jsonify({'message': str(e)}), 409
+        db.session.expire_all()
+        return jsonify(job_to_dict(db.session.get(Job, job_id))), 200
+
+    @app.route('/api/jobs/<job_id>/download', methods=['GET', 'OPTIONS'])
+    @jwt_required()
+    def download_job_result(job_id):
+        if request.method == 'OPTIONS':
+            return jsonify({}), 200
+        job = db.session.get(Job, job_id)
+        if job is None or job.kind != 'export':
+            abort(404)
+        if job.status != 'succeeded':
+            return jsonify({'message': f'Job is {job.status}'}), 409
+        fmt = job.params['format']
+        path = os.path.join(job_directory(), f'{job.id}.{fmt}')
+        if not os.path.exists(path):
+            abort(404)
+        return send_file(path, mimetype=EXPORT_FORMATS[fmt], as_attachment=True, download_name=f'clients.{fmt}')
@@ -0,0 +1,202 @@
+from contextlib import contextmanager
+import click
+from sqlalchemy import MetaData, insert, inspect, select, text
+from sqlalchemy.schema import CreateIndex
+from models import db, ChangeLog, Client, ClientMatchKey, Job, Program, ResourceVersion, Timestamp, client_programs
+from duplicates import rebuild_duplicate_index
+from versioning import MODEL_RESOURCES
+import search
+
+# Version of every migration applied to this database
+schema_version = db.Table('schema_version',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('description', db.String(200), nullable=False),
+    db.Column('applied_at', Timestamp, server_default=db.func.now())
+)
+
+
+# Migrations run in order under an exclusive lock (see migration_lock) and are
+# recorded in schema_version. Databases created before schema_version existed run all of them, so
+# every migration must tolerate finding its change already made. New databases get the
+# current models from the first migration and the rest find nothing to do.
+
+def create_tables(connection):
+    db.metadata.create_all(connection)
+
+
+# SQLite cannot ALTER in a column with a non-constant default, so the column is added
+# bare and backfilled; the models fill it in on insert
+ADDED_COLUMNS = (
+    ('client', 'updated_at', 'DATETIME', 'created_at'),
+    ('program', 'updated_at', 'DATETIME', 'created_at'),
+)
+
+
+def add_updated_at(connection):
+    inspector = inspect(connection)
+    for table, column, ddl_type, backfill_from in ADDED_COLUMNS:
+        if column in {c['name'] for c in inspector.get_columns(table)}:
+            continue
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+        connection.execute(text(f'UPDATE {table} SET {column} = {backfill_from}'))
+
+
+def drop_duplicate_program_name_unique(connection):
+    """program.name was declared unique twice, maintaining two identical indexes."""
+    constraints = {c['name'] for c in inspect(connection).get_unique_constraints('program')}
+    if 'uix_program_name' not in constraints:
+        return
+    if connection.dialect.name != 'sqlite':
+        connection.execute(text('ALTER TABLE program DROP CONSTRAINT uix_program_name'))
+        return
+    # SQLite cannot drop a constraint; rebuild the table from the current model instead
+    columns = ', '.join(c['name'] for c in inspect(connection).get_columns('program'))
+    Program.__table__.to_metadata(MetaData(), name='program_new').create(connection)
+    connection.execute(text(f'INSERT INTO program_new ({columns}) SELECT {columns} FROM program'))
+    connection.execute(text('DROP TABLE program'))
+    connection.execute(text('ALTER TABLE program_new RENAME TO program'))
+
+
+def add_query_indexes(connection):
+    # Not index.create(checkfirst=True): SQLite does not reflect expression indexes
+    for table in (Client.__table__, client_programs):
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def create_change_log(connection):
+    ChangeLog.__table__.create(connection, checkfirst=True)
+
+
+def create_duplicate_index(connection):
+    ClientMatchKey.__table__.create(connection, checkfirst=True)
+    rebuild_duplicate_index(connection)
+
+
+def create_job_table(connection):
+    Job.__table__.create(connection, checkfirst=True)
+
+
+MIGRATIONS = (
+    (1, 'Create tables', create_tables),
+    (2, 'Add updated_at to client and program', add_updated_at),
+    (3, 'Drop duplicate unique constraint on program.name', drop_duplicate_program_name_unique),
+    (4, 'Add indexes for listing, enrollment and name lookups', add_query_indexes),
+    (5, 'Add change_log table', create_change_log),
+    (6, 'Add client_match_key duplicate detection index', create_duplicate_index),
+    (7, 'Add job table for background jobs', create_job_table),
+)
+
+
+# How long a process waits for another one's upgrade before giving up
+MIGRATION_LOCK_TIMEOUT = 600  # seconds
+# Advisory lock key of schema upgrades on PostgreSQL and MySQL
+MIGRATION_LOCK_KEY = 'health_schema_upgrade'
+
+
+def _applied(connection):
+    if not inspect(connection).has_table('schema_version'):
+        return set()
+    return set(connection.execute(select(schema_version.c.version)).scalars())
+
+
+def applied_versions():
+    with db.engine.connect() as connection:
+        return _applied(connection)
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+@contextmanager
+def migration_lock(connection):
+    """Hold an exclusive lock on the database for a whole upgrade.
+
+    Workers that start together would otherwise all see the same pending migrations.
+    SQLite has no advisory locks, so the upgrade runs as one BEGIN IMMEDIATE
+    transaction (SQLite's DDL is transactional) and the other processes wait for it.
+    PostgreSQL and MySQL hold an advisory lock across the per-migration transactions.
+    """
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        busy_timeout = connection.exec_driver_sql('PRAGMA busy_timeout').scalar()
+        connection.exec_driver_sql(f'PRAGMA busy_timeout = {MIGRATION_LOCK_TIMEOUT * 1000}')
+        try:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+            yield
+        finally:
+            connection.exec_driver_sql(f'PRAGMA busy_timeout = {busy_timeout}')
+        return
+    if dialect == 'postgresql':
+        lock = text('SELECT pg_advisory_lock(hashtext(:key))')
+        unlock = text('SELECT pg_advisory_unlock(hashtext(:key))')
+    elif dialect in ('mysql', 'mariadb'):
+        lock = text(f'SELECT GET_LOCK(:key, {MIGRATION_LOCK_TIMEOUT})')
+        unlock = text('SELECT RELEASE_LOCK(:key)')
+    else:
+        yield
+        return
+    connection.execute(lock, {'key': MIGRATION_LOCK_KEY})
+    connection.commit()
+    try:
+        yield
+    finally:
+        connection.rollback()
+        connection.execute(unlock, {'key': MIGRATION_LOCK_KEY})
+        connection.commit()
+
+
+def upgrade_schema():
+    """Apply pending migrations and return their versions. Safe to run on every start,
+    from any number of processes at once: only the first applies anything."""
+    applied = []
+    with db.engine.connect() as connection:
+        with migration_lock(connection):
+            schema_version.create(connection, checkfirst=True)
+            # Read under the lock: another process may have just applied some
+            done = _applied(connection)
+            for version, description, migrate in MIGRATIONS:
+                if version in done:
+                    continue
+                migrate(connection)
+                connection.execute(insert(schema_version).values(version=version, description=description))
+                # SQLite commits the whole upgrade at the end, which releases its lock
+                if connection.dialect.name != 'sqlite':
+                    connection.commit()
+                applied.append(version)
+            seed_resource_versions(connection)
+            connection.commit()
+    return applied
+
+
+def upgrade_database():
+    """Apply pending migrations and install the client search index."""
+    applied = upgrade_schema()
+    search.install_search_index()
+    return applied
+
+
+def seed_resource_versions(connection):
+    """Create the version row of every resource so writes only ever need an UPDATE."""
+    table = ResourceVersion.__table__
+    existing = set(connection.execute(select(table.c.name)).scalars())
+    missing = [name for name in sorted(set(MODEL_RESOURCES.values())) if name not in existing]
+    if missing:
+        connection.execute(insert(table), [{'name': name, 'version': 0} for name in missing])
+
+
+def init_app(app):
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Apply pending schema migrations."""
+        applied = upgrade_database()
+        click.echo(f'Applied migrations: {", ".join(map(str, applied))}' if applied else 'Schema is up to date')
+
+    @app.cli.command('show-migrations')
+    def show_migrations_command():
+        """List schema migrations and whether each is applied."""
+        applied = applied_versions()
+        for version, description, _ in MIGRATIONS:
+            click.echo(f'{version:>4}  {"applied" if version in applied else "pending":<8} {description}')
@@ -0,0 +1,136 @@
+import re
+import click
+from flask import current_app
+from sqlalchemy import and_, column, func, literal_column, or_, table, text
+from models import db, Client
+
+# Full-text index over the searchable client columns. It is an external content table:
+# the text lives in `client` and the index is keyed by the client table's rowid.
+FTS_TABLE = 'client_fts'
+
+# Default and maximum number of ranked search results
+SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+
+_fts = table(FTS_TABLE, column('rowid'), column('rank'))
+
+# Columns matched by prefix when FTS5 is unavailable
+PREFIX_COLUMNS = (Client.first_name, Client.last_name, Client.email)
+
+_CREATE_STATEMENTS = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        first_name, last_name, email,
+        content='client', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS client_fts_ai AFTER INSERT ON client BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, first_name, last_name, email)
+        VALUES (new.rowid, new.first_name, new.last_name, new.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS client_fts_ad AFTER DELETE ON client BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, first_name, last_name, email)
+        VALUES ('delete', old.rowid, old.first_name, old.last_name, old.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS client_fts_au AFTER UPDATE OF first_name, last_name, email ON client BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, first_name, last_name, email)
+        VALUES ('delete', old.rowid, old.first_name, old.last_name, old.email);
+        INSERT INTO {FTS_TABLE}(rowid, first_name, last_name, email)
+        VALUES (new.rowid, new.first_name, new.last_name, new.email);
+    END""",
+)
+
+
+def fts5_available(connection):
+    if connection.dialect.name != 'sqlite':
+        return False
+    return bool(connection.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+
+def install_search_index():
+    """Create the FTS5 table and sync triggers if SQLite supports them.
+
+    Must run inside an app context after the client table exists. Returns True when the
+    index is usable; otherwise search falls back to prefix matching.
+    """
+    with db.engine.begin() as connection:
+        enabled = fts5_available(connection)
+        if enabled:
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}
+            ).scalar()
+            for statement in _CREATE_STATEMENTS:
+                connection.execute(text(statement))
+            # A freshly created index on an existing database starts empty
+            if not exists:
+                _rebuild(connection)
+    current_app.extensions['client_search'] = enabled
+    return enabled
+
+
+def rebuild_search_index():
+    with db.engine.begin() as connection:
+        _rebuild(connection)
+
+
+def _rebuild(connection):
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def search_enabled():
+    """Whether the FTS index is installed; looked up once per app when not set at startup."""
+    enabled = current_app.extensions.get('client_search')
+    if enabled is None:
+        enabled = False
+        if db.engine.dialect.name == 'sqlite':
+            enabled = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+            ).scalar() is not None
+        current_app.extensions['client_search'] = enabled
+    return enabled
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query that prefix-matches every term.
+
+    Terms are split the same way the unicode61 tokenizer splits indexed text, so
+    'jane.doe@ex' becomes "jane"* "doe"* "ex"*. Returns None when there are no terms.
+    """
+    terms = re.findall(r'[^\W_]+', query.lower())
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def prefix_filter(query):
+    """Case-insensitive prefix match on first name, last name or email.
+
+    Used when FTS5 is unavailable. Each branch is a range on lower(column) so the
+    lowercase indexes serve it on any database; ILIKE '%q%' always scans the table.
+    Returns None for an empty query, which matches every client.
+    """
+    prefix = query.strip().lower()
+    if not prefix:
+        return None
+    upper = prefix[:-1] + chr(min(ord(prefix[-1]) + 1, 0x10FFFF))
+    return or_(*(and_(func.lower(c) >= prefix, func.lower(c) < upper) for c in PREFIX_COLUMNS))
+
+
+def ranked_query(expression):
+    """Client query matching an FTS5 expression, best matches first."""
+    return (
+        Client.query
+        .join(_fts, _fts.c.rowid == literal_column('client.rowid'))
+        .filter(literal_column(FTS_TABLE).op('MATCH')(expression))
+        .order_by(_fts.c.rank, Client.id)
+    )
+
+
+def init_app(app):
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild the client full-text search index from the client table."""
+        if not install_search_index():
+            raise click.ClickException('SQLite FTS5 is not available; search uses prefix matching')
+        rebuild_search_index()
+        click.echo('Client search index rebuilt')
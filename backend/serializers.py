@@ -0,0 +1,89 @@
+from sqlalchemy import select
+from models import db, Client, Program, client_programs
+from pagination import CLIENT_FIELDS
+
+# Keep IN lists under SQLite's historical 999 bound-parameter limit
+IN_CHUNK_SIZE = 900
+# Largest number of ids accepted by POST /api/clients/batch; fits one IN list
+MAX_BATCH_CLIENTS = 500
+
+
+def load_programs(client_ids):
+    """Return {client_id: [{'id': ..., 'name': ...}]} for the given clients.
+
+    client_ids is either a list of ids or a SELECT of ids. A SELECT is sent as a single
+    subquery no matter how many clients it matches; a list is sent in IN chunks.
+    """
+    memberships = {}
+    if isinstance(client_ids, (list, tuple, set)):
+        client_ids = list(client_ids)
+        batches = [client_ids[i:i + IN_CHUNK_SIZE] for i in range(0, len(client_ids), IN_CHUNK_SIZE)]
+    else:
+        batches = [client_ids]
+    for batch in batches:
+        rows = db.session.execute(
+            select(client_programs.c.client_id, Program.id, Program.name)
+            .join(Program, Program.id == client_programs.c.program_id)
+            .where(client_programs.c.client_id.in_(batch))
+        )
+        for client_id, program_id, name in rows:
+            memberships.setdefault(client_id, []).append({'id': program_id, 'name': name})
+    return memberships
+
+
+def client_columns(fields=None, extra=()):
+    """Client columns to select for fields, followed by any extra columns not already in it.
+
+    Pass the result's field names to serialize_client_rows in the same order.
+    """
+    names = [f for f in fields or CLIENT_FIELDS if f != 'programs']
+    names += [f for f in extra if f not in names]
+    return [getattr(Client, name) for name in names]
+
+
+def serialize_client_rows(rows, fields=None, client_ids=None):
+    """Serialize client rows selected with client_columns(fields).
+
+    Programs are attached with one batched membership query instead of one per client.
+    Pass client_ids (a SELECT of the same clients) to load memberships with a single
+    subquery when the list is too large for an IN clause.
+    """
+    fields = fields or CLIENT_FIELDS
+    keys = [f for f in fields if f != 'programs']
+    records = [dict(zip(keys, row)) for row in rows]
+    if 'programs' not in fields or not records:
+        return records
+    if client_ids is None:
+        client_ids = [record['id'] for record in records]
+    memberships = load_programs(client_ids)
+    for record in records:
+        record['programs'] = memberships.get(record['id'], [])
+    return records
+
+
+def load_client(client_id):
+    """One client's full profile, or None if there is no such client."""
+    row = db.session.execute(select(*client_columns()).where(Client.id == client_id)).first()
+    return serialize_client_rows([row])[0] if row else None
+
+
+def load_clients(client_ids):
+    """Full profiles of the given clients keyed by id, in one client query and one
+    membership query. Ids with no client are left out.
+    """
+    rows = db.session.execute(select(*client_columns()).where(Client.id.in_(client_ids))).all()
+    return {record['id']: record for record in serialize_client_rows(rows)}
+
+
+PROGRAM_FIELDS = ('id', 'name', 'description', 'created_at')
+
+
+def serialize_programs(rows):
+    """Serialize program rows selected as PROGRAM_FIELDS."""
+    return [dict(zip(PROGRAM_FIELDS, row)) for row in rows]
+
+
+def load_program_catalogue():
+    return serialize_programs(db.session.execute(
+        select(*(getattr(Program, f) for f in PROGRAM_FIELDS)).order_by(Program.created_at, Program.id)
+    ))
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from models import db, Client, Program, client_programs
+
+# Number of newest clients listed on the dashboard
+RECENT_CLIENTS = 5
+# Longer registration windows are cut to this many days, which covers all history
+MAX_DAYS = 36500
+
+
+def program_enrollment_counts():
+    """Enrollment count per program, including programs nobody is enrolled in."""
+    rows = db.session.execute(
+        select(Program.id, Program.name, func.count(client_programs.c.client_id))
+        .outerjoin(client_programs, client_programs.c.program_id == Program.id)
+        .group_by(Program.id, Program.name)
+        .order_by(Program.name)
+    )
+    return [{'id': id, 'name': name, 'count': count} for id, name, count in rows]
+
+
+def registrations_per_day(since=None):
+    day = func.date(Client.created_at)
+    query = select(day, func.count()).group_by(day).order_by(day)
+    if since is not None:
+        query = query.where(Client.created_at >= since)
+    return [{'date': str(date), 'count': count} for date, count in db.session.execute(query)]
+
+
+def gender_counts():
+    rows = db.session.execute(select(Client.gender, func.count()).group_by(Client.gender))
+    return {gender or 'Unknown': count for gender, count in rows}
+
+
+def recent_clients(limit=RECENT_CLIENTS):
+    rows = db.session.execute(
+        select(Client.id, Client.first_name, Client.last_name, Client.email, Client.created_at)
+        .order_by(Client.created_at.desc(), Client.id.desc())
+        .limit(limit)
+    )
+    return [{
+        'id': id,
+        'first_name': first_name,
+        'last_name': last_name,
+        'email': email,
+        'created_at': created_at.isoformat() if created_at else None
+    } for id, first_name, last_name, email, created_at in rows]
+
+
+def dashboard_stats(days=None):
+    """Everything Dashboard.tsx shows, computed with grouped SQL instead of in the browser.
+
+    days limits the registration histogram to the last N days; None returns all history.
+    """
+    now = datetime.utcnow()
+    programs = program_enrollment_counts()
+    since = now - timedelta(days=days) if days else None
+    return {
+        'total_clients': db.session.execute(select(func.count()).select_from(Client)).scalar(),
+        'total_programs': len(programs),
+        'new_clients_30d': db.session.execute(
+            select(func.count()).select_from(Client).where(Client.created_at >= now - timedelta(days=30))
+        ).scalar(),
+        'active_programs': sum(1 for p in programs if p['count']),
+        'programs': programs,
+        'registrations': registrations_per_day(since),
+        'genders': gender_counts(),
+        'recent_clients': recent_clients()
+    }
@@ -0,0 +1,69 @@
+import os
+import sys
+import pytest
+
+# Tests import the backend modules the same way app.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from config import TestingConfig
+from models import db
+import search
+from schema import upgrade_schema
+
+
+def build_app(database_uri='sqlite:///:memory:'):
+    return create_app(TestingConfig, SQLALCHEMY_DATABASE_URI=database_uri)
+
+
+# Fixture to set up an app bound to a fresh in-memory database
+@pytest.fixture
+def app():
+    app = build_app()
+    with app.app_context():
+        upgrade_schema()
+        search.install_search_index()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Helper fixture returning headers with a valid JWT token
+@pytest.fixture
+def auth_headers(client):
+    response = client.post('/api/login', json={'username': 'doctor', 'password': 'password'})
+    return {'Authorization': f"Bearer {response.json['access_token']}"}
+
+
+# Fixture counting the SQL statements executed inside a `with query_counter:` block
+@pytest.fixture
+def query_counter(app):
+    from sqlalchemy import event
+
+    class QueryCounter:
+        def __init__(self):
+            self.count = 0
+            self.active = False
+
+        def __enter__(self):
+            self.count = 0
+            self.active = True
+            return self
+
+        def __exit__(self, *exc):
+            self.active = False
+
+    counter = QueryCounter()
+
+    def before_cursor_execute(*args):
+        if counter.active:
+            counter.count += 1
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    yield counter
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import bcrypt
+from app import create_app
+from config import TestingConfig
+from conftest import build_app
+import search
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Importing the app module must not create a database, hash passwords or load flasgger
+def test_import_has_no_side_effects(tmp_path):
+    database = tmp_path / 'health.db'
+    code = (
+        'import sys, app\n'
+        'assert "flasgger" not in sys.modules, "flasgger imported"\n'
+        'assert not hasattr(app, "app")\n'
+    )
+    env = {**os.environ, 'DATABASE_URL': f'sqlite:///{database}'}
+    subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env, check=True)
+    assert not database.exists()
+
+
+def test_auto_migrate_creates_schema(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'health.db'}"
+    app = create_app(TestingConfig, SQLALCHEMY_DATABASE_URI=uri, AUTO_MIGRATE=True)
+    response = app.test_client().post('/api/login', json={'username': 'doctor', 'password': 'password'})
+    token = response.json['access_token']
+    response = app.test_client().get('/api/programs', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    # A worker that skips migrations still finds the search index on first use
+    worker = build_app(uri)
+    with worker.app_context():
+        assert 'client_search' not in worker.extensions
+        assert search.search_enabled()
+
+
+def test_swagger_spec_built_once():
+    app = create_app(TestingConfig, SWAGGER_ENABLED=True)
+    client = app.test_client()
+    first = client.get('/apispec_1.json')
+    assert first.status_code == 200
+    assert 'paths' in first.json
+    assert list(app.swag._cached_specs) == ['apispec_1']
+    assert client.get('/apispec_1.json').data == first.data
+
+
+def test_login_with_configured_password_hash():
+    password_hash = bcrypt.hashpw(b's3cret', bcrypt.gensalt(rounds=4)).decode('utf-8')
+    app = create_app(TestingConfig, DOCTOR_USERNAME='dr.who', DOCTOR_PASSWORD_HASH=password_hash)
+    client = app.test_client()
+    assert client.post('/api/login', json={'username': 'dr.who', 'password': 's3cret'}).status_code == 200
+    assert client.post('/api/login', json={'username': 'dr.who', 'password': 'password'}).status_code == 401
+    assert client.post('/api/login', json={'username': 'doctor', 'password': 's3cret'}).status_code == 401
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+from benchmarks.datagen import generate, parse_scale
+from models import db, Client, client_programs
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_parse_scale():
+    assert parse_scale('100k') == 100_000
+    assert parse_scale('1M') == 1_000_000
+    assert parse_scale('250') == 250
+
+
+def test_generate_is_deterministic(app):
+    def snapshot():
+        rows = db.session.query(Client.first_name, Client.last_name, Client.email).order_by(Client.id).all()
+        return rows, db.session.query(client_programs).count()
+
+    with app.app_context():
+        counts = generate(200, programs=5, seed=7)
+        assert counts['clients'] == db.session.query(Client).count() == 200
+        assert counts['enrollments'] == db.session.query(client_programs).count()
+        first = snapshot()
+        db.drop_all()
+        db.create_all()
+        generate(200, programs=5, seed=7)
+        assert snapshot() == first
+
+
+def test_benchmark_runner_smoke(tmp_path):
+    output = tmp_path / 'results.json'
+    subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_routes', '--scale', '100', '--iterations', '2',
+         '--warmup', '0', '--output', str(output)],
+        cwd=BACKEND_DIR, check=True, capture_output=True
+    )
+    results = json.loads(output.read_text())
+    assert results['rows']['clients'] == 100
+    for name in ('login', 'list_page', 'list_deep_page', 'search', 'profile', 'enroll', 'stats', 'list_all'):
+        assert results['results'][name]['statuses'] == [200], name
+
+
+def test_startup_benchmark_smoke(tmp_path):
+    output = tmp_path / 'startup.json'
+    subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_startup', '--iterations', '1',
+         '--only', 'import_app', 'create_app', 'apispec_first', '--output', str(output)],
+        cwd=BACKEND_DIR, check=True, capture_output=True
+    )
+    results = json.loads(output.read_text())['results']
+    assert set(results) == {'import_app', 'create_app', 'apispec_first'}
+    assert results['create_app']['median_ms'] > 0
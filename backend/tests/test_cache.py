@@ -0,0 +1,132 @@
+import time
+from cache import Cache, MemoryCache, SQLiteCache, client_key, make_backend
+from conftest import build_app
+from models import db, Client, Program
+from schema import upgrade_schema
+
+
+def test_memory_cache_lru_and_ttl(monkeypatch):
+    backend = MemoryCache(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=60)
+    assert backend.get('a') == 1
+    backend.set('c', 3, ttl=60)
+    # 'b' was the least recently used entry
+    assert backend.get('b') is None
+    assert backend.get('a') == 1 and backend.get('c') == 3
+    assert backend.evictions == 1
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 61)
+    assert backend.get('a') is None
+
+
+# Two SQLiteCache instances on one file behave like two workers sharing a cache
+def test_sqlite_cache_is_shared(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    first, second = SQLiteCache(path, max_entries=2), SQLiteCache(path, max_entries=2)
+    first.set('programs', [{'id': '1', 'name': 'TB'}], ttl=60)
+    assert second.get('programs') == [{'id': '1', 'name': 'TB'}]
+    second.delete('programs')
+    assert first.get('programs') is None
+    for key in ('a', 'b', 'c'):
+        first.set(key, key, ttl=60)
+    assert second.get('a') is None and second.get('c') == 'c'
+    first.set('expired', 1, ttl=-1)
+    assert second.get('expired') is None
+
+
+def test_make_backend_specs(tmp_path):
+    assert isinstance(make_backend('memory', 10), MemoryCache)
+    assert isinstance(make_backend(f"sqlite:///{tmp_path / 'c.db'}", 10), SQLiteCache)
+    assert isinstance(make_backend('cache:MemoryCache', 10), MemoryCache)
+
+
+def test_cache_counts_hits_and_misses():
+    cache = Cache(MemoryCache())
+    assert cache.get_or_set('k', lambda: 'v') == 'v'
+    assert cache.get_or_set('k', lambda: 'other') == 'v'
+    assert cache.get_or_set('missing', lambda: None) is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+# The catalogue is read once, then served from the cache until a program is created
+def test_program_catalogue_cached_and_invalidated(client, auth_headers, query_counter):
+    db.session.add(Program(name='TB'))
+    db.session.commit()
+    client.get('/api/programs', headers=auth_headers)
+    with query_counter:
+        response = client.get('/api/programs', headers=auth_headers)
+    assert [p['name'] for p in response.json] == ['TB']
+    # Only the ETag version lookup reaches the database
+    assert query_counter.count == 1
+    response = client.post('/api/programs', json={'name': 'TB'}, headers=auth_headers)
+    assert response.status_code == 422
+    client.post('/api/programs', json={'name': 'HIV'}, headers=auth_headers)
+    response = client.get('/api/programs', headers=auth_headers)
+    assert sorted(p['name'] for p in response.json) == ['HIV', 'TB']
+
+
+def test_profile_cache_invalidated_on_writes(app, client, auth_headers):
+    record = Client(first_name='Ann', last_name='Lee', email='ann@example.com')
+    program = Program(name='TB')
+    db.session.add_all([record, program])
+    db.session.commit()
+    url = f'/api/clients/{record.id}'
+    assert client.get(url, headers=auth_headers).json['programs'] == []
+    assert app.extensions['cache'].backend.get(client_key(record.id, '1-1')) is not None
+    client.post(f'{url}/programs', json={'program_id': program.id}, headers=auth_headers)
+    assert [p['name'] for p in client.get(url, headers=auth_headers).json['programs']] == ['TB']
+    client.put(url, json={'first_name': 'Anne', 'last_name': 'Lee', 'email': 'ann@example.com'}, headers=auth_headers)
+    assert client.get(url, headers=auth_headers).json['first_name'] == 'Anne'
+    client.delete(f'{url}/programs/{program.id}', headers=auth_headers)
+    assert client.get(url, headers=auth_headers).json['programs'] == []
+
+
+# A program created by another worker is found even if this worker's catalogue is stale
+def test_enroll_sees_program_missing_from_stale_catalogue(client, auth_headers):
+    record = Client(first_name='Ann', last_name='Lee', email='ann@example.com')
+    db.session.add(record)
+    db.session.commit()
+    client.get('/api/programs', headers=auth_headers)
+    program = Program(name='Malaria')
+    db.session.add(program)
+    db.session.commit()
+    response = client.post(f'/api/clients/{record.id}/programs', json={'program_id': program.id}, headers=auth_headers)
+    assert response.status_code == 200
+    response = client.post(f'/api/clients/{record.id}/programs', json={'program_id': 'nope'}, headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_cache_stats_endpoint(client, auth_headers):
+    client.get('/api/programs', headers=auth_headers)
+    client.get('/api/programs', headers=auth_headers)
+    stats = client.get('/api/cache/stats', headers=auth_headers).json
+    assert stats['backend'] == 'MemoryCache'
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+
+# Each worker caches in its own memory; a write through one must not leave another
+# serving its old body under the new ETag
+def test_writes_in_another_process_retire_cached_entries(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'shared.db'}"
+    apps = [build_app(uri), build_app(uri)]
+    with apps[0].app_context():
+        upgrade_schema()
+    first, second = (app.test_client() for app in apps)
+    token = first.post('/api/login', json={'username': 'doctor', 'password': 'password'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert second.get('/api/programs', headers=headers).json == []
+    record_id = first.post('/api/clients', json={'first_name': 'Ann', 'last_name': 'Lee', 'email': 'ann@example.com'},
+                           headers=headers).json['id']
+    assert second.get(f'/api/clients/{record_id}', headers=headers).json['first_name'] == 'Ann'
+
+    first.post('/api/programs', json={'name': 'TB'}, headers=headers)
+    response = second.get('/api/programs', headers=headers)
+    assert [p['name'] for p in response.json] == ['TB']
+    revalidated = second.get('/api/programs', headers={**headers, 'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+    first.put(f'/api/clients/{record_id}', json={'first_name': 'Anne', 'last_name': 'Lee', 'email': 'ann@example.com'},
+              headers=headers)
+    assert second.get(f'/api/clients/{record_id}', headers=headers).json['first_name'] == 'Anne'
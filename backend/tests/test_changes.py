@@ -0,0 +1,70 @@
+from models import db, Client, Program
+
+
+def feed(client, headers, cursor, limit=None):
+    url = f'/api/changes?since={cursor}' + (f'&limit={limit}' if limit else '')
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return response.json
+
+
+def summary(page):
+    return [(c['resource'], c['operation']) for c in page['changes']]
+
+
+def test_changes_cover_every_write_path(client, auth_headers):
+    cursor = client.get('/api/changes', headers=auth_headers).json['next_cursor']
+    program_id = client.post('/api/programs', json={'name': 'TB'}, headers=auth_headers).json['id']
+    client_id = client.post('/api/clients', json={
+        'first_name': 'Jane', 'last_name': 'Doe', 'email': 'jane@example.com'
+    }, headers=auth_headers).json['id']
+    client.put(f'/api/clients/{client_id}', json={
+        'first_name': 'Janet', 'last_name': 'Doe', 'email': 'jane@example.com'
+    }, headers=auth_headers)
+    client.post(f'/api/clients/{client_id}/programs', json={'program_id': program_id}, headers=auth_headers)
+    client.delete(f'/api/clients/{client_id}/programs/{program_id}', headers=auth_headers)
+    client.post('/api/clients/import', data='first_name,last_name,email\nAl,Bo,al@example.com\n',
+                headers={**auth_headers, 'Content-Type': 'text/csv'})
+    client.post(f'/api/programs/{program_id}/enrollments', json={'client_ids': [client_id]}, headers=auth_headers)
+
+    page = feed(client, auth_headers, cursor)
+    assert summary(page) == [
+        ('program', 'insert'),
+        ('client', 'insert'),
+        ('client', 'update'),
+        ('enrollment', 'insert'),
+        ('enrollment', 'delete'),
+        ('client', 'insert'),
+        ('enrollment', 'insert'),
+    ]
+    changes = page['changes']
+    assert [c['seq'] for c in changes] == sorted(c['seq'] for c in changes)
+    assert changes[4] == {**changes[4], 'id': client_id, 'program_id': program_id}
+    # Only the latest change of a resource carries its current state
+    assert 'data' not in changes[1]
+    assert changes[2]['data']['first_name'] == 'Janet'
+    assert changes[5]['data']['email'] == 'al@example.com'
+    assert changes[0]['data']['name'] == 'TB'
+    assert page['has_more'] is False
+    assert feed(client, auth_headers, page['next_cursor'])['changes'] == []
+
+
+def test_changes_pages_and_orm_enrollments(app, client, auth_headers):
+    cursor = client.get('/api/changes', headers=auth_headers).json['next_cursor']
+    program = Program(name='HIV')
+    patient = Client(first_name='A', last_name='B', email='a@example.com', programs=[program])
+    db.session.add(patient)
+    db.session.commit()
+    first = feed(client, auth_headers, cursor, limit=2)
+    assert first['has_more'] is True
+    rest = feed(client, auth_headers, first['next_cursor'], limit=2)
+    assert sorted(summary(first) + summary(rest)) == [
+        ('client', 'insert'), ('enrollment', 'insert'), ('program', 'insert')
+    ]
+    assert rest['has_more'] is False
+
+
+def test_changes_rejects_bad_cursor(client, auth_headers):
+    response = client.get('/api/changes?since=bogus', headers=auth_headers)
+    assert response.status_code == 422
+    assert client.get('/api/changes?since=bogus').status_code == 401
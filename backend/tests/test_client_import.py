@@ -0,0 +1,74 @@
+import json
+from models import db, Client
+
+
+def post_csv(client, headers, body, query=''):
+    return client.post(f'/api/clients/import{query}', data=body.encode('utf-8'),
+                       headers={**headers, 'Content-Type': 'text/csv'})
+
+
+def test_import_csv(client, auth_headers):
+    body = (
+        'first_name,last_name,email,date_of_birth,phone\n'
+        'Ann,Lee,ann@example.com,1990-02-03,\n'
+        'Ben,Ode,ben@example.com,,+254700000000\n'
+    )
+    response = post_csv(client, auth_headers, body)
+    assert response.status_code == 200
+    assert response.json == {'inserted': 2, 'error_count': 0, 'errors': []}
+    ann = Client.query.filter_by(email='ann@example.com').one()
+    assert ann.date_of_birth.isoformat() == '1990-02-03'
+    assert ann.phone is None
+    assert ann.id and ann.created_at is not None
+
+
+# Rows are validated with the register_client rules and reported by row number
+def test_import_reports_row_errors(client, auth_headers):
+    db.session.add(Client(first_name='Old', last_name='Timer', email='old@example.com'))
+    db.session.commit()
+    lines = [
+        {'first_name': 'A', 'last_name': 'B', 'email': 'a@example.com'},
+        {'first_name': 'C', 'last_name': 'D', 'email': 'not-an-email'},
+        {'first_name': 'E', 'email': 'e@example.com'},
+        {'first_name': 'F', 'last_name': 'G', 'email': 'a@example.com'},
+        {'first_name': 'H', 'last_name': 'I', 'email': 'old@example.com'},
+        {'first_name': 'J', 'last_name': 'K', 'email': 'j@example.com', 'date_of_birth': '03/02/1990'},
+        {'first_name': ['L'], 'last_name': 'M', 'email': 'l@example.com'},
+        {'first_name': 'N', 'last_name': 'O', 'email': 'n@example.com', 'phone': {'home': '1'}},
+    ]
+    body = '\n'.join(json.dumps(line) for line in lines) + '\n{broken\n'
+    response = client.post('/api/clients/import?batch_size=2', data=body,
+                           headers={**auth_headers, 'Content-Type': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.json['inserted'] == 1
+    assert response.json['error_count'] == 8
+    assert {e['row']: e['message'] for e in response.json['errors']} == {
+        2: 'Invalid email format',
+        3: 'Missing required field: last_name',
+        4: 'Duplicate email in upload',
+        5: 'Email already exists',
+        6: 'Invalid date_of_birth format. Use YYYY-MM-DD',
+        7: 'Invalid value for first_name: expected a string',
+        8: 'Invalid value for phone: expected a string',
+        9: 'Invalid JSON',
+    }
+    assert Client.query.count() == 2
+
+
+# Duplicate checks cost one query per batch, not one per row
+def test_import_queries_scale_with_batches(client, auth_headers, query_counter):
+    body = 'first_name,last_name,email\n' + ''.join(f'F{i},L{i},c{i}@example.com\n' for i in range(100))
+    with query_counter:
+        response = post_csv(client, auth_headers, body, '?batch_size=50')
+    assert response.json['inserted'] == 100
+    # Per batch: existing-email check, insert, change log insert, duplicate index insert
+    # and resource version bump
+    assert query_counter.count == 10
+    assert Client.query.count() == 100
+
+
+def test_import_rejects_unknown_format(client, auth_headers):
+    response = client.post('/api/clients/import', data='x', headers={**auth_headers, 'Content-Type': 'text/plain'})
+    assert response.status_code == 422
+    response = post_csv(client, auth_headers, 'first_name\n', '?batch_size=0')
+    assert response.status_code == 422
@@ -0,0 +1,122 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+from conftest import build_app
+from models import db, Client, Program
+from schema import upgrade_schema
+
+
+def test_programs_not_modified(client, auth_headers, query_counter):
+    db.session.add(Program(name='TB'))
+    db.session.commit()
+    first = client.get('/api/programs', headers=auth_headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    with query_counter:
+        second = client.get('/api/programs', headers={**auth_headers, 'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert second.get_data() == b''
+    # Only the version lookup runs; no program rows are read
+    assert query_counter.count == 1
+
+
+def test_etag_changes_after_write(client, auth_headers):
+    etag = client.get('/api/programs', headers=auth_headers).headers['ETag']
+    client.post('/api/programs', json={'name': 'HIV'}, headers=auth_headers)
+    response = client.get('/api/programs', headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert [p['name'] for p in response.json] == ['HIV']
+
+
+# Enrolling a client changes every client representation that lists programs
+def test_client_etags_follow_enrollment(client, auth_headers):
+    record = Client(first_name='Ann', last_name='Lee', email='ann@example.com')
+    program = Program(name='TB')
+    db.session.add_all([record, program])
+    db.session.commit()
+    urls = ['/api/clients', f'/api/clients/{record.id}']
+    etags = {url: client.get(url, headers=auth_headers).headers['ETag'] for url in urls}
+    assert len(set(etags.values())) == 2
+    for url, etag in etags.items():
+        assert client.get(url, headers={**auth_headers, 'If-None-Match': etag}).status_code == 304
+    client.post(f'/api/clients/{record.id}/programs', json={'program_id': program.id}, headers=auth_headers)
+    for url, etag in etags.items():
+        assert client.get(url, headers={**auth_headers, 'If-None-Match': etag}).status_code == 200
+
+
+# Dashboard counts depend on the current time, so they are never answered from a validator
+def test_stats_are_not_conditional(client, auth_headers):
+    response = client.get('/api/stats', headers=auth_headers)
+    assert 'ETag' not in response.headers and 'Last-Modified' not in response.headers
+    response = client.get('/api/stats', headers={**auth_headers, 'If-None-Match': '*'})
+    assert response.status_code == 200
+
+
+def test_if_modified_since(client, auth_headers):
+    db.session.add(Program(name='TB'))
+    db.session.commit()
+    db.session.execute(text("UPDATE resource_version SET updated_at = '2024-05-01 10:00:00'"))
+    db.session.commit()
+    last_modified = client.get('/api/programs', headers=auth_headers).headers['Last-Modified']
+    assert last_modified == 'Wed, 01 May 2024 10:00:00 GMT'
+    response = client.get('/api/programs', headers={**auth_headers, 'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+    response = client.get('/api/programs', headers={**auth_headers, 'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'})
+    assert response.status_code == 200
+
+
+# A write in the current second may be followed by another in the same second, which
+# Last-Modified could not tell apart
+def test_last_modified_waits_for_the_second_to_pass(client, auth_headers):
+    db.session.add(Program(name='TB'))
+    db.session.commit()
+    first = client.get('/api/programs', headers=auth_headers)
+    assert 'Last-Modified' not in first.headers
+    stamp = db.session.execute(text("SELECT updated_at FROM resource_version WHERE name = 'program'")).scalar()
+    since = datetime.fromisoformat(stamp).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    response = client.get('/api/programs', headers={**auth_headers, 'If-Modified-Since': since})
+    assert response.status_code == 200
+
+
+def test_missing_client_is_not_cached(client, auth_headers):
+    response = client.get('/api/clients/missing', headers=auth_headers)
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+
+def test_updated_at_changes_on_update(client, auth_headers):
+    record = Client(first_name='Ann', last_name='Lee', email='ann@example.com')
+    db.session.add(record)
+    db.session.commit()
+    assert record.updated_at is not None
+    db.session.execute(text("UPDATE client SET updated_at = '2000-01-01 00:00:00'"))
+    db.session.commit()
+    response = client.put(f'/api/clients/{record.id}', json={
+        'first_name': 'Anne', 'last_name': 'Lee', 'email': 'ann@example.com'
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    db.session.refresh(record)
+    assert record.updated_at.year > 2000
+
+
+# Databases created before updated_at existed get the column added and backfilled
+def test_upgrade_schema_adds_updated_at(tmp_path):
+    app = build_app(f"sqlite:///{tmp_path / 'old.db'}")
+    with app.app_context():
+        db.session.execute(text(
+            'CREATE TABLE client (id VARCHAR(36) PRIMARY KEY, first_name VARCHAR(50) NOT NULL, '
+            'last_name VARCHAR(50) NOT NULL, email VARCHAR(120) NOT NULL UNIQUE, phone VARCHAR(20), '
+            'date_of_birth DATE, address VARCHAR(200), gender VARCHAR(20), emergency_contact VARCHAR(100), '
+            'created_at DATETIME DEFAULT CURRENT_TIMESTAMP)'
+        ))
+        db.session.execute(text("INSERT INTO client (id, first_name, last_name, email, created_at) "
+                                "VALUES ('1', 'A', 'B', 'a@example.com', '2024-05-01 10:00:00')"))
+        db.session.commit()
+        db.create_all()
+        upgrade_schema()
+        upgrade_schema()
+        columns = {c['name'] for c in inspect(db.engine).get_columns('client')}
+        assert 'updated_at' in columns
+        assert db.session.get(Client, '1').updated_at.isoformat() == '2024-05-01T10:00:00'
+        db.session.remove()
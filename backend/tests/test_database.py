@@ -0,0 +1,62 @@
+import threading
+from sqlalchemy import func, select, text
+from conftest import build_app
+from database import engine_options
+from models import db, Client
+from schema import upgrade_schema
+import search
+
+
+def test_engine_options_per_backend():
+    sqlite_file = engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///health.db', 'SQLITE_BUSY_TIMEOUT_MS': 2500})
+    assert sqlite_file['connect_args']['timeout'] == 2.5
+    assert 'pool_pre_ping' not in sqlite_file
+    server = engine_options({'SQLALCHEMY_DATABASE_URI': 'postgresql://u:p@db/health', 'DB_POOL_SIZE': 20})
+    assert server['pool_size'] == 20
+    assert server['pool_pre_ping'] is True
+    assert engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}) == {}
+
+
+def file_app(tmp_path):
+    app = build_app(f"sqlite:///{tmp_path / 'health.db'}")
+    with app.app_context():
+        upgrade_schema()
+        search.install_search_index()
+    return app
+
+
+def test_sqlite_pragmas_applied(tmp_path):
+    app = file_app(tmp_path)
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert db.session.execute(text('PRAGMA synchronous')).scalar() == 1
+        assert db.session.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+        db.session.remove()
+
+
+# Parallel writers against one database file must all succeed without "database is locked"
+def test_concurrent_writers(tmp_path):
+    app = file_app(tmp_path)
+    threads_count, per_thread = 8, 15
+    errors = []
+
+    def writer(n):
+        http = app.test_client()
+        token = http.post('/api/login', json={'username': 'doctor', 'password': 'password'}).json['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        for i in range(per_thread):
+            response = http.post('/api/clients', json={
+                'first_name': f'T{n}', 'last_name': f'W{i}', 'email': f't{n}w{i}@example.com'
+            }, headers=headers)
+            if response.status_code != 201:
+                errors.append((response.status_code, response.get_data(as_text=True)))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with app.app_context():
+        assert db.session.execute(select(func.count()).select_from(Client)).scalar() == threads_count * per_thread
+        db.session.remove()
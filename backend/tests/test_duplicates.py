@@ -0,0 +1,102 @@
+from datetime import date
+from sqlalchemy import insert, select
+from models import db, Client, ClientMatchKey
+from duplicates import blocking_keys, find_duplicates, soundex
+
+
+def register(client, headers, **fields):
+    body = {'first_name': 'Jon', 'last_name': 'Smith', 'email': 'jon@example.com', **fields}
+    response = client.post('/api/clients', json=body, headers=headers)
+    assert response.status_code == 201
+    return response.json
+
+
+def keys_of(client_id):
+    return set(db.session.execute(select(ClientMatchKey.key).where(ClientMatchKey.client_id == client_id)).scalars())
+
+
+def test_soundex():
+    assert soundex('Robert') == soundex('Rupert') == 'R163'
+    assert soundex('Ashcraft') == 'A261'
+    assert soundex('Tymczak') == 'T522'
+    assert soundex('Pfister') == 'P236'
+    assert soundex('Lee') == 'L000'
+    assert soundex('Núñez') == soundex('Nunez') == 'N520'
+    assert soundex('') is None and soundex('42') is None
+
+
+def test_register_reports_possible_duplicates(client, auth_headers):
+    first = register(client, auth_headers, date_of_birth='1990-01-01', phone='+254712345678')
+    assert first['possible_duplicates'] == []
+    # Same person: spelling variants, another email, local phone format
+    second = register(client, auth_headers, first_name='John', last_name='Smyth', email='john.s@example.com',
+                      date_of_birth='1990-01-01', phone='0712345678')
+    assert [m['id'] for m in second['possible_duplicates']] == [first['id']]
+    match = second['possible_duplicates'][0]
+    assert match['first_name'] == 'Jon' and match['date_of_birth'] == '1990-01-01'
+    assert match['score'] > 0.85
+    # Names entered the wrong way round
+    swapped = register(client, auth_headers, first_name='Smith', last_name='Jon', email='sj@example.com',
+                       date_of_birth='1990-01-01')
+    assert first['id'] in [m['id'] for m in swapped['possible_duplicates']]
+    # Same surname and birthday, different person; same name, different birthday
+    assert register(client, auth_headers, first_name='Mary', email='mary@example.com',
+                    date_of_birth='1990-01-01')['possible_duplicates'] == []
+    assert register(client, auth_headers, email='jon2@example.com',
+                    date_of_birth='1971-06-30')['possible_duplicates'] == []
+
+
+# A record without a date of birth is found from either side
+def test_missing_date_of_birth(client, auth_headers):
+    undated = register(client, auth_headers)
+    dated = register(client, auth_headers, email='jon.smith@example.com', date_of_birth='1985-03-04')
+    assert [m['id'] for m in dated['possible_duplicates']] == [undated['id']]
+    later = register(client, auth_headers, email='j.smith@example.com')
+    assert {m['id'] for m in later['possible_duplicates']} == {undated['id'], dated['id']}
+
+
+def test_update_reindexes_and_reports(app, client, auth_headers):
+    target = register(client, auth_headers, first_name='Grace', last_name='Wanjiru', email='grace@example.com',
+                      date_of_birth='1979-12-01')
+    other = register(client, auth_headers, first_name='Esther', last_name='Kamau', email='esther@example.com',
+                     date_of_birth='1979-12-01')
+    body = {'first_name': 'Grace', 'last_name': 'Wanjiru', 'email': 'esther@example.com',
+            'date_of_birth': '1979-12-01'}
+    response = client.put(f"/api/clients/{other['id']}", json=body, headers=auth_headers)
+    assert response.status_code == 200
+    assert [m['id'] for m in response.json['possible_duplicates']] == [target['id']]
+    assert keys_of(other['id']) == blocking_keys('Grace', 'Wanjiru', date(1979, 12, 1))
+    db.session.delete(db.session.get(Client, other['id']))
+    db.session.commit()
+    assert keys_of(other['id']) == set()
+
+
+# Candidates come from the blocks in one query, whatever the table size
+def test_lookup_reads_only_the_block(app, query_counter):
+    db.session.add_all([
+        Client(first_name=f'Peter{i}', last_name='Otieno', email=f'p{i}@example.com', date_of_birth=date(1960, 1, 1 + i))
+        for i in range(20)
+    ])
+    db.session.commit()
+    with query_counter:
+        matches = find_duplicates({'first_name': 'Peter3', 'last_name': 'Otieno', 'date_of_birth': date(1960, 1, 4)})
+    assert query_counter.count == 1
+    assert [m['email'] for m in matches] == ['p3@example.com']
+
+
+def test_import_indexes_clients(client, auth_headers):
+    body = 'first_name,last_name,email,date_of_birth\nAmina,Hussein,amina@example.com,2001-05-06\n'
+    response = client.post('/api/clients/import', data=body, headers={**auth_headers, 'Content-Type': 'text/csv'})
+    assert response.json['inserted'] == 1
+    matches = find_duplicates({'first_name': 'Aminah', 'last_name': 'Husein', 'date_of_birth': date(2001, 5, 6)})
+    assert [m['email'] for m in matches] == ['amina@example.com']
+
+
+def test_rebuild_command(app):
+    # Rows written behind the ORM's back are picked up by a rebuild
+    db.session.execute(insert(Client), [{'id': 'c1', 'first_name': 'Naomi', 'last_name': 'Chebet', 'email': 'n@example.com'}])
+    db.session.commit()
+    assert keys_of('c1') == set()
+    result = app.test_cli_runner().invoke(args=['rebuild-duplicate-index'])
+    assert 'rebuilt' in result.output
+    assert keys_of('c1') == blocking_keys('Naomi', 'Chebet', None)
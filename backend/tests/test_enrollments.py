@@ -0,0 +1,82 @@
+from sqlalchemy import func, select
+from models import db, Client, Program, client_programs
+
+
+def seed(count):
+    program = Program(name='Screening')
+    clients = [Client(first_name='F', last_name=str(i), email=f'c{i}@example.com') for i in range(count)]
+    db.session.add(program)
+    db.session.add_all(clients)
+    db.session.commit()
+    return program, [c.id for c in clients]
+
+
+def enrolled_count(program_id):
+    return db.session.execute(
+        select(func.count()).select_from(client_programs).where(client_programs.c.program_id == program_id)
+    ).scalar()
+
+
+def test_bulk_enroll_skips_existing_and_unknown(client, auth_headers):
+    program, ids = seed(5)
+    url = f'/api/programs/{program.id}/enrollments'
+    response = client.post(url, json={'client_ids': ids[:3]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json == {'requested': 3, 'changed': 3}
+    response = client.post(url, json={'client_ids': ids + ['unknown', ids[0]]}, headers=auth_headers)
+    assert response.json == {'requested': 6, 'changed': 2}
+    assert enrolled_count(program.id) == 5
+
+
+def test_bulk_unenroll(client, auth_headers):
+    program, ids = seed(4)
+    url = f'/api/programs/{program.id}/enrollments'
+    client.post(url, json={'client_ids': ids}, headers=auth_headers)
+    response = client.delete(url, json={'client_ids': ids[:2] + ['unknown']}, headers=auth_headers)
+    assert response.json['changed'] == 2
+    assert enrolled_count(program.id) == 2
+
+
+# A large cohort is enrolled with a handful of statements, whatever its size
+def test_bulk_enroll_is_set_based(client, auth_headers, query_counter):
+    program, ids = seed(300)
+    client.get('/api/programs', headers=auth_headers)
+    url = f'/api/programs/{program.id}/enrollments'
+    with query_counter:
+        response = client.post(url, json={'client_ids': ids}, headers=auth_headers)
+    assert response.json['changed'] == 300
+    # The program version (the catalogue itself is cached), INSERT ... SELECTs into the
+    # change log and the association table, and the version bump
+    assert query_counter.count == 4
+
+
+def test_bulk_enroll_validation(client, auth_headers):
+    program, ids = seed(1)
+    url = f'/api/programs/{program.id}/enrollments'
+    assert client.post(url, json={'client_ids': []}, headers=auth_headers).status_code == 422
+    assert client.post(url, json={'client_ids': [1, 2]}, headers=auth_headers).status_code == 422
+    assert client.post(url, json=[ids[0]], headers=auth_headers).status_code == 422
+    assert client.post(url, json={'client_ids': ['x'] * 10001}, headers=auth_headers).status_code == 422
+    assert client.post('/api/programs/missing/enrollments', json={'client_ids': ids}, headers=auth_headers).status_code == 404
+
+
+def test_single_enrollment_uses_association_table(client, auth_headers, query_counter):
+    program, ids = seed(1)
+    url = f'/api/clients/{ids[0]}/programs'
+    body = {'program_id': program.id}
+    client.get('/api/programs', headers=auth_headers)
+    with query_counter:
+        response = client.post(url, json=body, headers=auth_headers)
+    assert response.status_code == 200
+    # Client existence check, the program version, the change log and association
+    # INSERT ... SELECTs, the version bump
+    assert query_counter.count == 5
+    response = client.post(url, json={'program_id': program.id}, headers=auth_headers)
+    assert response.status_code == 422
+    assert response.json['message'] == 'Client already enrolled in this program'
+    assert client.post('/api/clients/missing/programs', json={'program_id': program.id}, headers=auth_headers).status_code == 404
+    response = client.delete(f'{url}/{program.id}', headers=auth_headers)
+    assert response.status_code == 200
+    response = client.delete(f'{url}/{program.id}', headers=auth_headers)
+    assert response.status_code == 400
+    assert client.delete(f'{url}/missing', headers=auth_headers).status_code == 404
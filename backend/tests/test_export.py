@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import export
+from models import db, Client, Program
+
+
+def seed(count):
+    tb = Program(name='TB')
+    hiv = Program(name='HIV')
+    start = datetime(2025, 3, 1, 9, 0, 0)
+    clients = []
+    for i in range(count):
+        c = Client(first_name=f'F{i}', last_name=f'L{i}', email=f'c{i}@example.com',
+                   created_at=start + timedelta(days=i))
+        if i % 2 == 0:
+            c.programs.append(tb)
+        if i % 3 == 0:
+            c.programs.append(hiv)
+        clients.append(c)
+    db.session.add_all(clients)
+    db.session.commit()
+    return tb, hiv
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_export_ndjson_streams_every_client(client, auth_headers, monkeypatch):
+    seed(7)
+    # Small chunks make the export walk several keyset pages
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_SIZE', 3)
+    response = client.get('/api/clients/export', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    records = read_ndjson(response)
+    assert [r['email'] for r in records] == [f'c{i}@example.com' for i in range(7)]
+    assert sorted(p['name'] for p in records[0]['programs']) == ['HIV', 'TB']
+    assert records[1]['programs'] == []
+
+
+def test_export_filters(client, auth_headers):
+    tb, hiv = seed(6)
+    response = client.get(f'/api/clients/export?program_id={hiv.id}', headers=auth_headers)
+    assert [r['email'] for r in read_ndjson(response)] == ['c0@example.com', 'c3@example.com']
+    response = client.get('/api/clients/export?created_from=2025-03-02&created_to=2025-03-03', headers=auth_headers)
+    assert [r['email'] for r in read_ndjson(response)] == ['c1@example.com', 'c2@example.com']
+
+
+def test_export_csv(client, auth_headers):
+    seed(2)
+    response = client.get('/api/clients/export?format=csv', headers=auth_headers)
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [r['email'] for r in rows] == ['c0@example.com', 'c1@example.com']
+    assert sorted(rows[0]['programs'].split(';')) == ['HIV', 'TB']
+    assert rows[0]['created_at'] == '2025-03-01T09:00:00'
+
+
+def test_export_rejects_bad_parameters(client, auth_headers):
+    assert client.get('/api/clients/export?format=xml', headers=auth_headers).status_code == 422
+    assert client.get('/api/clients/export?created_from=yesterday', headers=auth_headers).status_code == 422
@@ -0,0 +1,73 @@
+import logging
+import os
+import pytest
+import instrumentation
+from models import db, Client
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_metrics_per_endpoint(client, auth_headers):
+    db.session.add(Client(first_name='Ann', last_name='Lee', email='ann@example.com'))
+    db.session.commit()
+    for _ in range(3):
+        client.get('/api/clients', headers=auth_headers)
+    client.get('/api/clients/search?q=ann', headers=auth_headers)
+    metrics = client.get('/api/metrics', headers=auth_headers).json
+    stats = metrics['endpoints']['GET /api/clients']
+    assert stats['count'] == 3
+    assert stats['avg_sql_count'] >= 2
+    assert stats['avg_response_bytes'] > 0
+    assert sum(stats['latency_histogram'].values()) == 3
+    assert 'GET /api/clients/search' in metrics['endpoints']
+    assert 'hits' in metrics['cache']
+
+
+# Logged entries use the route template and parameter names, never bodies or values
+def test_request_log_is_redacted(client, auth_headers):
+    handler = ListHandler()
+    logger = logging.getLogger('health.requests')
+    logger.addHandler(handler)
+    try:
+        response = client.post('/api/clients', json={
+            'first_name': 'Secret', 'last_name': 'Patient', 'email': 'secret.patient@example.com'
+        }, headers=auth_headers)
+        client.get(f"/api/clients/{response.json['id']}", headers=auth_headers)
+        client.get('/api/clients/search?q=secret', headers=auth_headers)
+    finally:
+        logger.removeHandler(handler)
+    logged = '\n'.join(handler.messages)
+    assert '"route":"/api/clients/<id>"' in logged
+    assert '"params":["q"]' in logged
+    assert 'secret' not in logged.lower()
+    assert response.json['id'] not in logged
+    recent = client.get('/api/metrics', headers=auth_headers).json['recent']
+    assert 'secret' not in str(recent).lower()
+
+
+# A worker forked after create_app gets its own listener thread instead of an undrained queue
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_log_listener_restarts_after_fork(app):
+    parent = instrumentation._listener
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            listener = instrumentation._listener
+            handler = ListHandler()
+            listener.handlers += (handler,)
+            logging.getLogger('health.requests').info('from the worker')
+            listener.stop()
+            ok = listener is not parent and handler.messages == ['from the worker']
+        finally:
+            os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert instrumentation._listener is parent
@@ -0,0 +1,188 @@
+import os
+import socket
+import threading
+import time
+import pytest
+from sqlalchemy import insert, select
+from conftest import build_app
+from models import db, Client, Job, Program
+from jobs import JOB_KINDS, JobKind, get_runner, prepare_nothing
+from schema import upgrade_schema
+import search
+
+
+# Worker threads need their own connections, which an in-memory database cannot give
+@pytest.fixture
+def app(tmp_path):
+    app = build_app(f"sqlite:///{tmp_path / 'jobs.db'}")
+    app.config['JOB_DIR'] = str(tmp_path / 'jobs')
+    with app.app_context():
+        upgrade_schema()
+        search.install_search_index()
+        yield app
+        get_runner().shutdown()
+        db.session.remove()
+
+
+@pytest.fixture
+def blocking_kind(monkeypatch):
+    """A 'wait' job kind that runs until release is set, checking for cancellation."""
+    release, started = threading.Event(), threading.Semaphore(0)
+
+    def run(context):
+        started.release()
+        while not release.wait(0.01):
+            context.progress(0)
+        return {'done': True}
+
+    monkeypatch.setitem(JOB_KINDS, 'wait', JobKind(prepare_nothing, run))
+    yield release, started
+    release.set()
+
+
+def wait_for(client, headers, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f'/api/jobs/{job_id}', headers=headers).json
+        if job['status'] in ('succeeded', 'failed', 'cancelled') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_import_job(client, auth_headers):
+    body = 'first_name,last_name,email\n' + ''.join(f'F{i},L{i},c{i}@example.com\n' for i in range(25)) + 'X,Y,bad\n'
+    response = client.post('/api/jobs/import?batch_size=10', data=body,
+                           headers={**auth_headers, 'Content-Type': 'text/csv'})
+    assert response.status_code == 202
+    assert response.headers['Location'] == f"/api/jobs/{response.json['id']}"
+    job = wait_for(client, auth_headers, response.json['id'])
+    assert job['status'] == 'succeeded'
+    assert (job['progress'], job['total']) == (26, 26)
+    assert job['result']['inserted'] == 25 and job['result']['error_count'] == 1
+    assert db.session.execute(select(db.func.count()).select_from(Client)).scalar() == 25
+    # The spooled upload is removed once imported
+    assert os.listdir(client.application.config['JOB_DIR']) == []
+
+
+def test_export_job_and_download(client, auth_headers):
+    db.session.add_all([Client(first_name=f'F{i}', last_name='L', email=f'e{i}@example.com') for i in range(3)])
+    db.session.commit()
+    response = client.post('/api/jobs/export', json={'format': 'csv'}, headers=auth_headers)
+    job = wait_for(client, auth_headers, response.json['id'])
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'rows': 3, 'format': 'csv', 'download': f"/api/jobs/{job['id']}/download"}
+    download = client.get(job['result']['download'], headers=auth_headers)
+    assert download.status_code == 200
+    assert download.mimetype == 'text/csv'
+    assert 'clients.csv' in download.headers['Content-Disposition']
+    assert len(download.get_data(as_text=True).splitlines()) == 4
+    bad = client.post('/api/jobs/export', json={'created_from': 'yesterday'}, headers=auth_headers)
+    assert bad.status_code == 422
+    assert client.post('/api/jobs/export', json=['csv'], headers=auth_headers).status_code == 422
+
+
+def test_enrollments_job(client, auth_headers):
+    program = Program(name='HIV')
+    db.session.add(program)
+    db.session.execute(insert(Client), [
+        {'id': f'c{i}', 'first_name': 'A', 'last_name': 'B', 'email': f'c{i}@example.com'} for i in range(5)
+    ])
+    db.session.commit()
+    body = {'program_id': program.id, 'client_ids': ['c0', 'c1', 'c2', 'missing']}
+    job = wait_for(client, auth_headers, client.post('/api/jobs/enrollments', json=body, headers=auth_headers).json['id'])
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'requested': 4, 'changed': 3}
+    body['action'] = 'unenroll'
+    job = wait_for(client, auth_headers, client.post('/api/jobs/enrollments', json=body, headers=auth_headers).json['id'])
+    assert job['result'] == {'requested': 4, 'changed': 3}
+    body['program_id'] = 'nope'
+    assert client.post('/api/jobs/enrollments', json=body, headers=auth_headers).status_code == 422
+    assert client.post('/api/jobs/enrollments', json=[body], headers=auth_headers).status_code == 422
+
+
+def test_unknown_kind(client, auth_headers):
+    response = client.post('/api/jobs/reboot', headers=auth_headers)
+    assert response.status_code == 422
+    assert client.get('/api/jobs/nope', headers=auth_headers).status_code == 404
+
+
+# JOB_WORKERS bounds the running jobs; the rest wait and can be cancelled before they start
+def test_bounded_concurrency_and_cancel(client, auth_headers, blocking_kind):
+    release, started = blocking_kind
+    ids = [client.post('/api/jobs/wait', headers=auth_headers).json['id'] for _ in range(3)]
+    assert started.acquire(timeout=5) and started.acquire(timeout=5)
+    assert not started.acquire(timeout=0.2)
+    statuses = [db.session.get(Job, i).status for i in ids]
+    assert statuses.count('running') == 2 and statuses.count('queued') == 1
+    waiting = ids[statuses.index('queued')]
+    cancelled = client.post(f'/api/jobs/{waiting}/cancel', headers=auth_headers)
+    assert cancelled.status_code == 200 and cancelled.json['status'] == 'cancelled'
+    # A running job stops at its next progress checkpoint
+    running = ids[statuses.index('running')]
+    assert client.post(f'/api/jobs/{running}/cancel', headers=auth_headers).json['cancel_requested'] is True
+    assert wait_for(client, auth_headers, running)['status'] == 'cancelled'
+    release.set()
+    others = [i for i in ids if i not in (waiting, running)]
+    assert wait_for(client, auth_headers, others[0])['status'] == 'succeeded'
+    assert client.post(f'/api/jobs/{waiting}/cancel', headers=auth_headers).status_code == 409
+
+
+def test_queue_full(app, client, auth_headers, blocking_kind):
+    get_runner().max_pending = 1
+    get_runner().workers = 1
+    client.post('/api/jobs/wait', headers=auth_headers)
+    blocking_kind[1].acquire(timeout=5)
+    assert client.post('/api/jobs/wait', headers=auth_headers).status_code == 202
+    response = client.post('/api/jobs/wait', headers=auth_headers)
+    assert response.status_code == 503
+
+
+def test_failed_job_reports_error(client, auth_headers, monkeypatch):
+    def run(context):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setitem(JOB_KINDS, 'broken', JobKind(prepare_nothing, run))
+    job = wait_for(client, auth_headers, client.post('/api/jobs/broken', headers=auth_headers).json['id'])
+    assert (job['status'], job['error']) == ('failed', 'disk full')
+
+
+# A job whose process died is failed, and its queued successors still run
+def test_recovers_jobs_of_dead_workers(app, client, auth_headers):
+    db.session.add(Job(id='stale', kind='search_index', status='running', worker=f'{socket.gethostname()}:999999999'))
+    db.session.add(Job(id='queued', kind='search_index', params={}))
+    db.session.commit()
+    job = wait_for(client, auth_headers, 'queued')
+    assert job['status'] == 'succeeded' and job['result'] == {'enabled': True}
+    db.session.expire_all()
+    stale = db.session.get(Job, 'stale')
+    assert stale.status == 'failed' and 'exited' in stale.error
+
+
+# A job of this process is never stale; one left by an earlier process with the same pid is
+def test_recover_tells_own_jobs_from_reused_pids(app):
+    runner = get_runner()
+    runner.wake()
+    runner.shutdown()
+    mine = runner.worker_name
+    earlier = mine.rsplit(':', 1)[0] + ':0ld70ken'
+    db.session.add(Job(id='mine', kind='search_index', status='running', worker=mine))
+    db.session.add(Job(id='earlier', kind='search_index', status='running', worker=earlier))
+    db.session.commit()
+    runner.recover()
+    db.session.expire_all()
+    assert db.session.get(Job, 'mine').status == 'running'
+    assert db.session.get(Job, 'earlier').status == 'failed'
+
+
+# Jobs queued within the same second still run in the order they were queued
+def test_jobs_run_in_queue_order(app, client, auth_headers, monkeypatch):
+    ran = []
+
+    def run(context):
+        ran.append(context.id)
+
+    monkeypatch.setitem(JOB_KINDS, 'record', JobKind(prepare_nothing, run))
+    get_runner().workers = 1
+    ids = [client.post('/api/jobs/record', headers=auth_headers).json['id'] for _ in range(8)]
+    assert wait_for(client, auth_headers, ids[-1])['status'] == 'succeeded'
+    assert ran == ids
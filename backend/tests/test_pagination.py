@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from models import db, Client, Program
+
+
+def make_clients(count, same_second=False):
+    start = datetime(2025, 1, 1, 8, 0, 0)
+    clients = []
+    for i in range(count):
+        clients.append(Client(
+            first_name=f'First{i}',
+            last_name=f'Last{i}',
+            email=f'client{i}@example.com',
+            created_at=start if same_second else start + timedelta(minutes=i)
+        ))
+    db.session.add_all(clients)
+    db.session.commit()
+    return clients
+
+
+# Without limit/cursor the endpoint keeps returning a bare list
+def test_list_clients_legacy_mode(client, auth_headers):
+    make_clients(3)
+    response = client.get('/api/clients', headers=auth_headers)
+    assert response.status_code == 200
+    assert isinstance(response.json, list)
+    assert len(response.json) == 3
+    assert set(response.json[0]) == {
+        'id', 'first_name', 'last_name', 'email', 'phone', 'date_of_birth',
+        'address', 'gender', 'emergency_contact', 'created_at', 'programs'
+    }
+
+
+# Walking next_cursor visits every client exactly once, oldest first
+def test_list_clients_keyset_pages(client, auth_headers):
+    make_clients(7)
+    seen = []
+    url = '/api/clients?limit=3'
+    while url:
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        assert len(response.json['items']) <= 3
+        seen.extend(c['email'] for c in response.json['items'])
+        cursor = response.json['next_cursor']
+        url = f'/api/clients?limit=3&cursor={cursor}' if cursor else None
+    assert seen == [f'client{i}@example.com' for i in range(7)]
+
+
+# Rows sharing a created_at second are ordered and paged by id
+def test_list_clients_cursor_breaks_ties_on_id(client, auth_headers):
+    clients = make_clients(5, same_second=True)
+    first = client.get('/api/clients?limit=2', headers=auth_headers).json
+    rest = client.get(f"/api/clients?limit=10&cursor={first['next_cursor']}", headers=auth_headers).json
+    ids = [c['id'] for c in first['items'] + rest['items']]
+    assert ids == sorted(c.id for c in clients)
+    assert rest['next_cursor'] is None
+
+
+# fields= projects the response down to the requested keys
+def test_list_clients_field_projection(client, auth_headers):
+    make_clients(2)
+    program = Program(name='TB')
+    db.session.add(program)
+    first = Client.query.first()
+    first.programs.append(program)
+    db.session.commit()
+    response = client.get('/api/clients?fields=first_name,programs', headers=auth_headers)
+    assert response.status_code == 200
+    assert set(response.json[0]) == {'id', 'first_name', 'programs'}
+    response = client.get('/api/clients?limit=1&fields=email', headers=auth_headers)
+    assert set(response.json['items'][0]) == {'id', 'email'}
+
+
+def test_list_clients_rejects_bad_parameters(client, auth_headers):
+    assert client.get('/api/clients?fields=password', headers=auth_headers).status_code == 422
+    assert client.get('/api/clients?limit=abc', headers=auth_headers).status_code == 422
+    assert client.get('/api/clients?limit=5&cursor=not-a-cursor', headers=auth_headers).status_code == 422
+
+
+def test_search_clients_paginated(client, auth_headers):
+    make_clients(4)
+    response = client.get('/api/clients/search?q=first&limit=3', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json['items']) == 3
+    assert response.json['next_cursor'] is not None
+    response = client.get('/api/clients/search?q=first1', headers=auth_headers)
+    assert [c['email'] for c in response.json] == ['client1@example.com']
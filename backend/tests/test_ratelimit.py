@@ -0,0 +1,100 @@
+import time
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter
+from app import create_app
+from config import TestingConfig
+import ratelimit
+
+
+def limited_app(tmp_path, **overrides):
+    return create_app(
+        TestingConfig,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'health.db'}",
+        AUTO_MIGRATE=True,
+        RATELIMIT_ENABLED=True,
+        RATELIMIT_STORAGE_URI=f"sqlite:///{tmp_path / 'ratelimit.db'}",
+        **overrides
+    )
+
+
+# Two storages on one file stand in for two gunicorn workers
+def test_sqlite_moving_window_is_shared_and_weighted(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'ratelimit.db'}"
+    worker_a = MovingWindowRateLimiter(storage_from_string(uri))
+    worker_b = MovingWindowRateLimiter(storage_from_string(uri))
+    item = parse('5 per minute')
+    assert worker_a.hit(item, 'ip', cost=3)
+    assert not worker_b.hit(item, 'ip', cost=3)
+    assert worker_b.hit(item, 'ip', cost=2)
+    assert not worker_a.hit(item, 'ip')
+    assert worker_a.hit(item, 'other-ip')
+    window = worker_b.get_window_stats(item, 'ip')
+    assert window.remaining == 0
+    assert time.time() < window.reset_time <= time.time() + 60
+
+
+def test_sqlite_fixed_window(tmp_path):
+    storage = storage_from_string(f"sqlite:///{tmp_path / 'ratelimit.db'}")
+    limiter = FixedWindowRateLimiter(storage)
+    item = parse('2 per minute')
+    assert limiter.hit(item, 'ip') and limiter.hit(item, 'ip')
+    assert not limiter.hit(item, 'ip')
+    storage.clear(item.key_for('ip'))
+    assert limiter.hit(item, 'ip')
+    assert storage.check()
+    assert storage.reset() > 0
+
+
+def test_routes_are_cost_weighted_and_preflights_exempt(tmp_path):
+    app = limited_app(tmp_path, RATELIMIT_APPLICATION='14 per minute')
+    client = app.test_client()
+    token = client.post('/api/login', json={'username': 'doctor', 'password': 'password'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    for _ in range(30):
+        assert client.options('/api/clients').status_code == 200
+    # 13 units left: two list pages at 5 each, then three profile-sized requests
+    assert ratelimit.ROUTE_COSTS['get_all_clients'] == 5
+    for _ in range(2):
+        assert client.get('/api/clients', headers=headers).status_code == 200
+    assert client.get('/api/clients', headers=headers).status_code == 429
+    for _ in range(3):
+        assert client.get('/api/programs', headers=headers).status_code == 200
+    assert client.get('/api/programs', headers=headers).status_code == 429
+
+
+# Default limits count each route separately
+def test_default_limits_are_per_route(tmp_path):
+    app = limited_app(tmp_path, RATELIMIT_DEFAULT='2 per minute')
+    client = app.test_client()
+    assert [client.get('/api/programs').status_code for _ in range(3)] == [401, 401, 429]
+    assert client.get('/api/stats').status_code == 401
+
+
+def test_route_limit_applies_on_top_of_defaults(tmp_path):
+    app = limited_app(tmp_path)
+    client = app.test_client()
+    login = {'username': 'doctor', 'password': 'wrong'}
+    limit = int(ratelimit.ROUTE_LIMITS['login'].split()[0])
+    assert [client.post('/api/login', json=login).status_code for _ in range(limit + 1)] == [401] * limit + [429]
+
+
+# A disabled app built first must not switch limiting off for the next one
+def test_limiter_state_is_per_app(tmp_path):
+    create_app(TestingConfig)
+    app = limited_app(tmp_path, RATELIMIT_DEFAULT='1 per minute')
+    client = app.test_client()
+    assert client.get('/api/programs').status_code == 401
+    assert client.get('/api/programs').status_code == 429
+
+
+# Job status polls have their own limit instead of the default ones
+def test_polling_limit_replaces_defaults(tmp_path):
+    app = limited_app(tmp_path, RATELIMIT_DEFAULT='2 per minute')
+    client = app.test_client()
+    token = client.post('/api/login', json={'username': 'doctor', 'password': 'password'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert [client.get('/api/jobs/nope', headers=headers).status_code for _ in range(5)] == [404] * 5
+    limit = int(ratelimit.POLLING_LIMITS['get_job'].split()[0])
+    statuses = [client.get('/api/jobs/nope', headers=headers).status_code for _ in range(limit - 4)]
+    assert statuses == [404] * (limit - 5) + [429]
@@ -1,51 +1,74 @@
-import pytest
-from app import app, db
-from models import User, Client, Program
-
-@pytest.fixture
-def client():
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
-    with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
-            user = User(username='doctor', password='password')
-            db.session.add(user)
-            db.session.commit()
-        yield client
-        with app.app_context():
-            db.drop_all()
+from models import db, Client, Program
+
+
+def register(client, headers, **fields):
+    body = {'first_name': 'Bob', 'last_name': 'Brown', 'email': 'bob.brown@example.com', **fields}
+    response = client.post('/api/clients', json=body, headers=headers)
+    assert response.status_code == 201
+    return response.json['id']
+
 
 def test_login_success(client):
     response = client.post('/api/login', json={'username': 'doctor', 'password': 'password'})
     assert response.status_code == 200
     assert 'access_token' in response.json
 
+
 def test_login_failure(client):
     response = client.post('/api/login', json={'username': 'wrong', 'password': 'wrong'})
     assert response.status_code == 401
-    assert response.json['error'] == 'Invalid credentials'
-
-def test_register_client(client):
-    login_response = client.post('/api/login', json={'username': 'doctor', 'password': 'password'})
-    token = login_response.json['access_token']
-    response = client.post('/api/clients', json={
-        'first_name': 'Bob',
-        'last_name': 'Brown',
-        'email': 'bob.brown@example.com'
-    }, headers={'Authorization': f'Bearer {token}'})
+    assert response.json['message'] == 'Invalid credentials'
+    response = client.post('/api/login', json={'username': 'doctor'})
+    assert response.status_code == 422
+    response = client.post('/api/login', json={'username': 'doctor', 'password': 'pässwörd'})
+    assert response.status_code == 401
+
+
+def test_create_program(client, auth_headers):
+    response = client.post('/api/programs', json={'name': 'TB', 'description': 'Tuberculosis Program'},
+                           headers=auth_headers)
     assert response.status_code == 201
-    assert response.json['message'] == 'Client registered'
-
-def test_search_clients(client):
-    login_response = client.post('/api/login', json={'username': 'doctor', 'password': 'password'})
-    token = login_response.json['access_token']
-    client.post('/api/clients', json={
-        'first_name': 'Bob',
-        'last_name': 'Brown',
-        'email': 'bob.brown@example.com'
-    }, headers={'Authorization': f'Bearer {token}'})
-    response = client.get('/api/clients/search?q=Bob', headers={'Authorization': f'Bearer {token}'})
+    assert response.json['message'] == 'Program created successfully'
+    assert db.session.get(Program, response.json['id']).name == 'TB'
+    assert client.post('/api/programs', json={}, headers=auth_headers).status_code == 422
+
+
+def test_register_client(client, auth_headers):
+    client_id = register(client, auth_headers, phone='+1234567890', date_of_birth='1990-01-01')
+    assert db.session.get(Client, client_id).email == 'bob.brown@example.com'
+    response = client.post('/api/clients', json={'first_name': 'Bob', 'last_name': 'Brown',
+                                                 'email': 'bob.brown@example.com'}, headers=auth_headers)
+    assert response.status_code == 422
+    assert response.json['message'] == 'Email already exists'
+
+
+def test_enroll_client(client, auth_headers):
+    program_id = client.post('/api/programs', json={'name': 'HIV'}, headers=auth_headers).json['id']
+    client_id = register(client, auth_headers, first_name='Jane', last_name='Smith', email='jane.smith@example.com')
+    response = client.post(f'/api/clients/{client_id}/programs', json={'program_id': program_id}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['message'] == 'Client enrolled successfully'
+    assert [p.name for p in db.session.get(Client, client_id).programs] == ['HIV']
+
+
+def test_search_clients(client, auth_headers):
+    register(client, auth_headers)
+    register(client, auth_headers, first_name='Alice', last_name='Johnson', email='alice.johnson@example.com')
+    response = client.get('/api/clients/search?q=Bob', headers=auth_headers)
+    assert response.status_code == 200
+    assert [c['first_name'] for c in response.json] == ['Bob']
+
+
+def test_get_client_profile(client, auth_headers):
+    program_id = client.post('/api/programs', json={'name': 'Malaria', 'description': 'Malaria Prevention Program'},
+                             headers=auth_headers).json['id']
+    client_id = register(client, auth_headers, phone='+9876543210', date_of_birth='1985-05-15')
+    client.post(f'/api/clients/{client_id}/programs', json={'program_id': program_id}, headers=auth_headers)
+    response = client.get(f'/api/clients/{client_id}', headers=auth_headers)
     assert response.status_code == 200
-    assert len(response.json) == 1
-    assert response.json[0]['first_name'] == 'Bob'
\ No newline at end of file
+    profile = response.json
+    assert (profile['first_name'], profile['last_name'], profile['email']) == ('Bob', 'Brown', 'bob.brown@example.com')
+    assert (profile['phone'], profile['date_of_birth']) == ('+9876543210', '1985-05-15')
+    assert [p['name'] for p in profile['programs']] == ['Malaria']
+    assert client.get(f'/api/clients/{client_id}').status_code == 401
+    assert client.get('/api/clients/999', headers=auth_headers).status_code == 404
@@ -0,0 +1,137 @@
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import IntegrityError
+import threading
+import pytest
+from conftest import build_app
+from models import db, Client, Program, client_programs
+from pagination import encode_cursor, keyset_after
+from serializers import client_columns
+import schema
+import search
+
+
+def explain(statement):
+    """SQLite's query plan for a statement, as one string."""
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled.string}', params)
+    return '\n'.join(row[-1] for row in rows)
+
+
+def seed_clients():
+    program = Program(name='TB')
+    db.session.add(program)
+    for i in range(20):
+        client = Client(first_name=f'First{i}', last_name=f'Last{i}', email=f'c{i}@example.com')
+        client.programs.append(program)
+        db.session.add(client)
+    db.session.commit()
+    return program.id
+
+
+def test_list_page_uses_created_at_index(app):
+    seed_clients()
+    page = select(*client_columns(extra=('created_at',))).order_by(Client.created_at, Client.id).limit(51)
+    plan = explain(page)
+    assert 'ix_client_created_at_id' in plan
+    assert 'TEMP B-TREE' not in plan
+    cursor = encode_cursor('2025-01-01T00:00:00', 'some-id')
+    plan = explain(page.where(keyset_after(Client.created_at, Client.id, cursor)))
+    assert 'ix_client_created_at_id' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_program_members_use_program_index(app):
+    program_id = seed_clients()
+    members = select(client_programs.c.client_id).where(client_programs.c.program_id == program_id)
+    assert 'COVERING INDEX ix_client_programs_program_client' in explain(members)
+    counts = select(client_programs.c.program_id, func.count()).group_by(client_programs.c.program_id)
+    assert 'ix_client_programs_program_client' in explain(counts)
+
+
+def test_prefix_search_uses_lowercase_indexes(app):
+    seed_clients()
+    plan = explain(select(Client.id).where(search.prefix_filter('Fir')))
+    assert 'SCAN client' not in plan
+    for index in ('ix_client_lower_first_name', 'ix_client_lower_last_name', 'ix_client_lower_email'):
+        assert index in plan
+
+
+def create_legacy_tables():
+    """The schema as released before migrations: no updated_at, no indexes, program.name unique twice."""
+    for statement in (
+        'CREATE TABLE client (id VARCHAR(36) PRIMARY KEY, first_name VARCHAR(50) NOT NULL, '
+        'last_name VARCHAR(50) NOT NULL, email VARCHAR(120) NOT NULL UNIQUE, phone VARCHAR(20), '
+        'date_of_birth DATE, address VARCHAR(200), gender VARCHAR(20), emergency_contact VARCHAR(100), '
+        'created_at DATETIME DEFAULT CURRENT_TIMESTAMP)',
+        'CREATE TABLE program (id VARCHAR(36) PRIMARY KEY, name VARCHAR(100) NOT NULL UNIQUE, description TEXT, '
+        'created_at DATETIME DEFAULT CURRENT_TIMESTAMP, CONSTRAINT uix_program_name UNIQUE (name))',
+        'CREATE TABLE client_programs (client_id VARCHAR(36) REFERENCES client (id), '
+        'program_id VARCHAR(36) REFERENCES program (id), PRIMARY KEY (client_id, program_id))',
+        "INSERT INTO program (id, name, created_at) VALUES ('p1', 'TB', '2024-05-01 10:00:00')",
+        "INSERT INTO client (id, first_name, last_name, email) VALUES ('c1', 'A', 'B', 'a@example.com')",
+        "INSERT INTO client_programs VALUES ('c1', 'p1')",
+    ):
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+def test_legacy_database_is_migrated(tmp_path):
+    app = build_app(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with app.app_context():
+        create_legacy_tables()
+        assert schema.upgrade_schema() == [version for version, _, _ in schema.MIGRATIONS]
+        assert schema.upgrade_schema() == []
+        indexes = set(db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+        assert {'ix_client_created_at_id', 'ix_client_programs_program_client', 'ix_client_lower_email'} <= indexes
+        program = db.session.get(Program, 'p1')
+        assert program.name == 'TB'
+        assert program.updated_at.isoformat() == '2024-05-01T10:00:00'
+        assert [c.id for c in program.clients] == ['c1']
+        # Existing clients get their duplicate detection keys
+        assert db.session.execute(text("SELECT COUNT(*) FROM client_match_key WHERE client_id = 'c1'")).scalar() == 2
+        db.session.add(Program(name='TB'))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+        sql = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'program'")).scalar()
+        assert 'uix_program_name' not in sql
+        # The added columns have no server default, so new rows rely on the model's
+        db.session.add_all([Program(name='HIV'), Client(first_name='New', last_name='Row', email='new@example.com')])
+        db.session.commit()
+        assert db.session.scalar(select(Program.updated_at).where(Program.name == 'HIV')) is not None
+        assert db.session.scalar(select(Client.updated_at).where(Client.email == 'new@example.com')) is not None
+        db.session.remove()
+
+
+# Workers booting together apply each migration once; the rest wait and find nothing to do
+def test_concurrent_upgrades(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'legacy.db'}"
+    with build_app(uri).app_context():
+        create_legacy_tables()
+        db.session.remove()
+    results = []
+
+    def upgrade(app):
+        try:
+            with app.app_context():
+                results.append(schema.upgrade_schema())
+        except Exception as e:
+            results.append(e)
+
+    # Apps are built up front: compiling routes in several threads at once trips a
+    # CPython 3.11 AST bug
+    threads = [threading.Thread(target=upgrade, args=(build_app(uri),)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not [r for r in results if isinstance(r, Exception)], results
+    assert sorted(results, key=len) == [[]] * 5 + [[version for version, _, _ in schema.MIGRATIONS]]
+
+
+def test_migration_commands(app):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['show-migrations'])
+    assert result.output.count('applied') == len(schema.MIGRATIONS)
+    assert runner.invoke(args=['upgrade-db']).output.strip() == 'Schema is up to date'
@@ -0,0 +1,88 @@
+from sqlalchemy import text
+from models import db, Client
+import search
+
+
+def add_client(first_name, last_name, email):
+    client = Client(first_name=first_name, last_name=last_name, email=email)
+    db.session.add(client)
+    db.session.commit()
+    return client
+
+
+def search_emails(client, headers, q, extra=''):
+    response = client.get(f'/api/clients/search?q={q}{extra}', headers=headers)
+    assert response.status_code == 200
+    return [c['email'] for c in response.json]
+
+
+def test_search_index_installed(app):
+    assert search.search_enabled()
+
+
+# Terms are prefix matched and must all be present
+def test_search_prefix_and_all_terms(client, auth_headers):
+    add_client('Alice', 'Johnson', 'alice.johnson@example.com')
+    add_client('Alicia', 'Keys', 'akeys@example.com')
+    add_client('Bob', 'Brown', 'bob.brown@example.com')
+    assert sorted(search_emails(client, auth_headers, 'ali')) == ['akeys@example.com', 'alice.johnson@example.com']
+    assert search_emails(client, auth_headers, 'ali%20john') == ['alice.johnson@example.com']
+    assert search_emails(client, auth_headers, 'bob.brown@ex') == ['bob.brown@example.com']
+
+
+# Clients matching the term in more columns rank first
+def test_search_results_are_ranked(client, auth_headers):
+    add_client('Grace', 'Hopper', 'ghopper@example.com')
+    add_client('Grace', 'Grace', 'grace.grace@example.com')
+    assert search_emails(client, auth_headers, 'grace')[0] == 'grace.grace@example.com'
+
+
+# Triggers keep the index in step with inserts, updates and deletes
+def test_search_index_follows_writes(client, auth_headers):
+    record = add_client('Carol', 'White', 'carol@example.com')
+    record.last_name = 'Black'
+    db.session.commit()
+    assert search_emails(client, auth_headers, 'white') == []
+    assert search_emails(client, auth_headers, 'black') == ['carol@example.com']
+    db.session.delete(record)
+    db.session.commit()
+    assert search_emails(client, auth_headers, 'carol') == []
+
+
+def test_search_limit_and_cursor(client, auth_headers):
+    for i in range(5):
+        add_client('Dana', f'Doe{i}', f'dana{i}@example.com')
+    assert len(search_emails(client, auth_headers, 'dana', '&fields=email')) == 5
+    first = client.get('/api/clients/search?q=dana&limit=2', headers=auth_headers).json
+    assert len(first['items']) == 2
+    seen = [c['id'] for c in first['items']]
+    cursor = first['next_cursor']
+    while cursor:
+        page = client.get(f'/api/clients/search?q=dana&limit=2&cursor={cursor}', headers=auth_headers).json
+        seen.extend(c['id'] for c in page['items'])
+        cursor = page['next_cursor']
+    assert len(set(seen)) == 5
+    response = client.get(f"/api/clients/search?q=dana&limit=2&cursor={first['next_cursor']}x", headers=auth_headers)
+    assert response.status_code == 422
+
+
+# Without FTS5 the endpoint prefix-matches names and emails, like the FTS path does
+def test_search_falls_back_to_prefix_match(app, client, auth_headers):
+    add_client('Eve', 'Adams', 'eve@example.com')
+    add_client('Steve', 'Ng', 'steve@example.com')
+    app.extensions['client_search'] = False
+    assert search_emails(client, auth_headers, 'EVE@exa') == ['eve@example.com']
+    assert search_emails(client, auth_headers, 'ada') == ['eve@example.com']
+    assert search_emails(client, auth_headers, 've@exa') == []
+    assert len(search_emails(client, auth_headers, '')) == 2
+
+
+# The rebuild command repopulates an index that fell out of sync
+def test_rebuild_search_index_command(app, client, auth_headers):
+    add_client('Frank', 'Miller', 'frank@example.com')
+    db.session.execute(text(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('delete-all')"))
+    db.session.commit()
+    assert search_emails(client, auth_headers, 'frank') == []
+    result = app.test_cli_runner().invoke(args=['rebuild-search-index'])
+    assert result.exit_code == 0
+    assert search_emails(client, auth_headers, 'frank') == ['frank@example.com']
@@ -0,0 +1,139 @@
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+import pytest
+from models import db, Client, Program
+import json_provider
+
+
+def seed(count, programs_per_client=2):
+    programs = [Program(name=f'Program{i}') for i in range(3)]
+    db.session.add_all(programs)
+    for i in range(count):
+        client = Client(first_name=f'First{i}', last_name=f'Last{i}', email=f'client{i}@example.com')
+        client.programs.extend(programs[:programs_per_client])
+        db.session.add(client)
+    db.session.commit()
+    # Drop the identity map so every request starts from the database
+    db.session.expunge_all()
+
+
+def statements_for(client, url, headers, query_counter):
+    with query_counter:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return query_counter.count, response.json
+
+
+# Listing clients costs the same number of statements for 3 rows as for 40
+def test_list_clients_constant_queries(app, client, auth_headers, query_counter):
+    seed(3)
+    small, body = statements_for(client, '/api/clients', auth_headers, query_counter)
+    assert len(body) == 3
+    assert sorted(p['name'] for p in body[0]['programs']) == ['Program0', 'Program1']
+    seed_more = [Client(first_name='Extra', last_name=f'E{i}', email=f'extra{i}@example.com') for i in range(37)]
+    db.session.add_all(seed_more)
+    db.session.commit()
+    db.session.expunge_all()
+    large, body = statements_for(client, '/api/clients', auth_headers, query_counter)
+    assert len(body) == 40
+    assert large == small
+
+
+def test_paginated_and_search_constant_queries(app, client, auth_headers, query_counter):
+    seed(5)
+    small, _ = statements_for(client, '/api/clients?limit=2', auth_headers, query_counter)
+    large, body = statements_for(client, '/api/clients?limit=5', auth_headers, query_counter)
+    assert len(body['items']) == 5
+    assert large == small
+    small, _ = statements_for(client, '/api/clients/search?q=First1', auth_headers, query_counter)
+    large, body = statements_for(client, '/api/clients/search?q=First', auth_headers, query_counter)
+    assert len(body) == 5
+    assert large == small
+
+
+def test_profile_uses_batched_programs(app, client, auth_headers, query_counter):
+    seed(1, programs_per_client=3)
+    client_id = Client.query.first().id
+    db.session.expunge_all()
+    count, body = statements_for(client, f'/api/clients/{client_id}', auth_headers, query_counter)
+    assert len(body['programs']) == 3
+    # Version lookup for the ETag, the client row and its memberships
+    assert count == 3
+
+
+# Projections without programs skip the membership query entirely
+def test_projection_without_programs_skips_membership_query(app, client, auth_headers, query_counter):
+    seed(4)
+    count, body = statements_for(client, '/api/clients?fields=first_name', auth_headers, query_counter)
+    assert 'programs' not in body[0]
+    assert count == 2
+
+
+# Both encoders write dates, datetimes, UUIDs and decimals identically
+def test_encoders_agree():
+    value = {
+        'day': date(1990, 5, 17),
+        'at': datetime(2025, 3, 1, 9, 30, 15),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'amount': Decimal('12.50'),
+        'items': [1, None, 'x']
+    }
+    expected = (
+        b'{"day":"1990-05-17","at":"2025-03-01T09:30:15","uuid":"12345678-1234-5678-1234-567812345678",'
+        b'"amount":"12.50","items":[1,null,"x"]}'
+    )
+    assert json_provider.stdlib_dumps(value) == expected
+    if 'orjson' in json_provider.ENCODERS:
+        assert json_provider.orjson_dumps(value) == expected
+    with pytest.raises(ValueError):
+        json_provider.get_encoder('simdjson')
+
+
+def test_responses_use_configured_encoder(client, auth_headers):
+    seed(2)
+    fast = client.get('/api/clients', headers=auth_headers)
+    client.application.config['JSON_ENCODER'] = 'stdlib'
+    client.application.json = json_provider.FastJSONProvider(client.application)
+    slow = client.get('/api/clients', headers=auth_headers)
+    assert slow.data == fast.data
+    assert fast.json[0]['created_at'][10] == 'T'
+
+
+# A batch of profiles costs one client query and one membership query
+def test_batch_profiles_in_requested_order(app, client, auth_headers, query_counter):
+    seed(5)
+    ids = [c.id for c in Client.query.order_by(Client.email)]
+    requested = [ids[3], 'no-such-id', ids[0], ids[3], ids[4]]
+    with query_counter:
+        response = client.post('/api/clients/batch', json={'ids': requested}, headers=auth_headers)
+    assert response.status_code == 200
+    assert query_counter.count == 2
+    assert [c['id'] for c in response.json['clients']] == [ids[3], ids[0], ids[4]]
+    assert response.json['missing'] == ['no-such-id']
+    profile = client.get(f'/api/clients/{ids[0]}', headers=auth_headers).json
+    assert response.json['clients'][1] == profile
+
+
+def test_batch_rejects_bad_and_oversized_requests(client, auth_headers):
+    from serializers import MAX_BATCH_CLIENTS
+    for body in ({}, {'ids': []}, {'ids': 'abc'}, {'ids': [1, 2]}, [1], 'ids'):
+        assert client.post('/api/clients/batch', json=body, headers=auth_headers).status_code == 422
+    ids = [str(uuid.uuid4()) for _ in range(MAX_BATCH_CLIENTS + 1)]
+    response = client.post('/api/clients/batch', json={'ids': ids}, headers=auth_headers)
+    assert response.status_code == 422
+    response = client.post('/api/clients/batch', json={'ids': ids[:MAX_BATCH_CLIENTS]}, headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json['missing']) == MAX_BATCH_CLIENTS
+
+
+# Programs are listed in the order they were created, not by their random ids
+def test_program_catalogue_in_creation_order(client, auth_headers):
+    db.session.add_all([
+        Program(id='b', name='TB', created_at=datetime(2024, 5, 1)),
+        Program(id='a', name='HIV', created_at=datetime(2024, 5, 2)),
+        Program(id='c', name='Malaria', created_at=datetime(2024, 5, 2)),
+    ])
+    db.session.commit()
+    response = client.get('/api/programs', headers=auth_headers)
+    assert [p['name'] for p in response.json] == ['TB', 'HIV', 'Malaria']
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from models import db, Client, Program
+
+
+def seed():
+    now = datetime.utcnow()
+    tb, hiv, malaria = Program(name='TB'), Program(name='HIV'), Program(name='Malaria')
+    db.session.add_all([tb, hiv, malaria])
+    clients = [
+        Client(first_name='A', last_name='One', email='a@example.com', gender='Female', created_at=now - timedelta(days=60)),
+        Client(first_name='B', last_name='Two', email='b@example.com', gender='Male', created_at=now - timedelta(days=2)),
+        Client(first_name='C', last_name='Three', email='c@example.com', gender='Female', created_at=now - timedelta(days=2)),
+    ]
+    clients[0].programs.extend([tb, hiv])
+    clients[1].programs.append(tb)
+    db.session.add_all(clients)
+    db.session.commit()
+    return clients
+
+
+def test_stats_aggregates(client, auth_headers):
+    clients = seed()
+    response = client.get('/api/stats', headers=auth_headers)
+    assert response.status_code == 200
+    stats = response.json
+    assert stats['total_clients'] == 3
+    assert stats['total_programs'] == 3
+    assert stats['new_clients_30d'] == 2
+    assert stats['active_programs'] == 2
+    assert {p['name']: p['count'] for p in stats['programs']} == {'HIV': 1, 'Malaria': 0, 'TB': 2}
+    assert [r['count'] for r in stats['registrations']] == [1, 2]
+    assert stats['genders'] == {'Female': 2, 'Male': 1}
+    assert stats['recent_clients'][-1]['id'] == clients[0].id
+
+
+def test_stats_registration_window(client, auth_headers):
+    seed()
+    response = client.get('/api/stats?days=7', headers=auth_headers)
+    assert [r['count'] for r in response.json['registrations']] == [2]
+    for days in ('0', '-1', '\u00b2', 'week'):
+        assert client.get(f'/api/stats?days={days}', headers=auth_headers).status_code == 422
+    response = client.get(f'/api/stats?days={10 ** 12}', headers=auth_headers)
+    assert [r['count'] for r in response.json['registrations']] == [1, 2]
+
+
+# The dashboard costs the same number of statements whatever the number of clients
+def test_stats_constant_queries(client, auth_headers, query_counter):
+    seed()
+    with query_counter:
+        client.get('/api/stats', headers=auth_headers)
+    small = query_counter.count
+    db.session.add_all([Client(first_name='X', last_name=str(i), email=f'x{i}@example.com') for i in range(30)])
+    db.session.commit()
+    with query_counter:
+        client.get('/api/stats', headers=auth_headers)
+    assert query_counter.count == small
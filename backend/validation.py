@@ -0,0 +1,37 @@
+import re
+from datetime import datetime
+
+EMAIL_PATTERN = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+
+CLIENT_REQUIRED_FIELDS = ('first_name', 'last_name', 'email')
+CLIENT_OPTIONAL_FIELDS = ('phone', 'address', 'gender', 'emergency_contact')
+
+
+class ValidationError(ValueError):
+    """Raised with a user-facing message when a client payload is invalid."""
+
+
+def validate_client(data):
+    """Check a client payload and return the column values to store.
+
+    Shared by register, update and bulk import so every path applies the same rules.
+    """
+    if not data:
+        raise ValidationError('No data provided')
+    for field in CLIENT_REQUIRED_FIELDS + CLIENT_OPTIONAL_FIELDS:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValidationError(f'Invalid value for {field}: expected a string')
+    for field in CLIENT_REQUIRED_FIELDS:
+        if not data.get(field):
+            raise ValidationError(f'Missing required field: {field}')
+    if not isinstance(data['email'], str) or not EMAIL_PATTERN.match(data['email']):
+        raise ValidationError('Invalid email format')
+    try:
+        dob = datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date() if data.get('date_of_birth') else None
+    except (TypeError, ValueError):
+        raise ValidationError('Invalid date_of_birth format. Use YYYY-MM-DD')
+    values = {field: data[field] for field in CLIENT_REQUIRED_FIELDS}
+    values['date_of_birth'] = dob
+    for field in CLIENT_OPTIONAL_FIELDS:
+        values[field] = data.get(field)
+    return values
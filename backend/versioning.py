@@ -0,0 +1,129 @@
+import zlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import has_request_context, make_response, request
+from sqlalchemy import event, insert, select, update
+from models import db, Client, Program, ResourceVersion
+
+# Resource whose version changes when an ORM object of this class is written.
+# Enrollment changes show up as a modified Client (its programs collection changed).
+MODEL_RESOURCES = {Client: 'client', Program: 'program'}
+
+_versions = ResourceVersion.__table__
+
+
+def bump_versions(connection, names):
+    """Increment the version of each named resource inside the caller's transaction."""
+    names = sorted(set(names))
+    if not names:
+        return
+    if has_request_context():
+        request.resource_versions = {}
+    now = datetime.utcnow().replace(microsecond=0)
+    result = connection.execute(
+        update(_versions)
+        .where(_versions.c.name.in_(names))
+        .values(version=_versions.c.version + 1, updated_at=now)
+    )
+    if result.rowcount < len(names):
+        existing = set(connection.execute(select(_versions.c.name).where(_versions.c.name.in_(names))).scalars())
+        connection.execute(insert(_versions), [
+            {'name': name, 'version': 1, 'updated_at': now} for name in names if name not in existing
+        ])
+
+
+def bump(*names):
+    """Record a change made outside the ORM unit of work, e.g. a Core bulk insert."""
+    bump_versions(db.session.connection(), names)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _bump_flushed_resources(session, flush_context):
+    names = set()
+    for obj in list(session.new) + list(session.deleted):
+        if type(obj) in MODEL_RESOURCES:
+            names.add(MODEL_RESOURCES[type(obj)])
+    for obj in session.dirty:
+        if type(obj) in MODEL_RESOURCES and session.is_modified(obj):
+            names.add(MODEL_RESOURCES[type(obj)])
+    if names:
+        bump_versions(session.connection(), names)
+
+
+def read_versions(names):
+    """Return {name: (version, updated_at)} for the named resources.
+
+    Read at most once per request: the ETag of @conditional and the cache keys of
+    the view share the lookup. Writes in the request clear it.
+    """
+    known = getattr(request, 'resource_versions', None) if has_request_context() else None
+    if known is None:
+        known = {}
+        if has_request_context():
+            request.resource_versions = known
+    missing = [name for name in names if name not in known]
+    if missing:
+        rows = {name: (version, updated_at) for name, version, updated_at in db.session.execute(
+            select(_versions.c.name, _versions.c.version, _versions.c.updated_at).where(_versions.c.name.in_(missing))
+        )}
+        for name in missing:
+            known[name] = rows.get(name, (0, None))
+    return {name: known[name] for name in names}
+
+
+def resource_version(*names):
+    """The current versions of the named resources joined into one string, e.g. '12-3'."""
+    return '-'.join(str(version) for version, _ in read_versions(names).values())
+
+
+def current_validators(names):
+    """Return (etag, last_modified) for the current request over the named resources.
+
+    Costs a single primary-key lookup. The request path and query string are part of
+    the tag so that different pages and projections of a resource never share one.
+    """
+    rows = read_versions(names)
+    parts = [str(version) for version, _ in rows.values()]
+    parts.append(format(zlib.crc32(request.full_path.encode('utf-8')), 'x'))
+    stamps = [updated_at for _, updated_at in rows.values() if updated_at is not None]
+    last_modified = max(stamps).replace(tzinfo=timezone.utc) if stamps else None
+    return '-'.join(parts), last_modified
+
+
+def conditional(*names):
+    """Answer GET requests with 304 Not Modified while the named resources are unchanged.
+
+    Put it below @jwt_required() so authentication still runs first. 200 responses get
+    an ETag and Last-Modified header; other methods pass straight through.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            etag, last_modified = current_validators(names)
+            # Last-Modified has one-second resolution, so a time in the current second
+            # could also cover a later write in that second: it is neither sent nor
+            # trusted until the second has passed
+            if last_modified is not None and last_modified >= datetime.now(timezone.utc).replace(microsecond=0):
+                last_modified = None
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(
+                    request.if_modified_since and last_modified and last_modified <= request.if_modified_since
+                )
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let browsers keep the body but always revalidate it
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -19,33 +19,34 @@ import {
 ChartJS.register(ArcElement, Tooltip, Legend, LineElement, PointElement, LinearScale, BarElement, CategoryScale, Title);
 
 // Interfaces
-interface Client {
+interface RecentClient {
   id: string;
   first_name: string;
   last_name: string;
   email: string;
-  gender: string | null;
   created_at: string;
-  programs: { id: string; name: string }[];
 }
 
-interface Program {
+interface ProgramCount {
   id: string;
   name: string;
-  description: string | null;
-  created_at: string;
+  count: number;
 }
 
-interface ProgramCount {
-  name: string;
-  count: number;
+interface Stats {
+  total_clients: number;
+  total_programs: number;
+  new_clients_30d: number;
+  active_programs: number;
+  programs: ProgramCount[];
+  registrations: { date: string; count: number }[];
+  genders: Record<string, number>;
+  recent_clients: RecentClient[];
 }
 
 const Dashboard: React.FC = () => {
-  const [programs, setPrograms] = useState<Program[]>([]);
-  const [clients, setClients] = useState<Client[]>([]);
-  const [clientError, setClientError] = useState<string>('');
-  const [programError, setProgramError] = useState<string>('');
+  const [stats, setStats] = useState<Stats | null>(null);
+  const [statsError, setStatsError] = useState<string>('');
   const [loading, setLoading] = useState<boolean>(true);
   const token = localStorage.getItem('token') || sessionStorage.getItem('token');
 
@@ -54,71 +55,42 @@ const Dashboard: React.FC = () => {
     if (token) {
       fetchData();
     } else {
-      setClientError('Please log in to view the dashboard.');
-      setProgramError('Please log in to view the dashboard.');
+      setStatsError('Please log in to view the dashboard.');
       setLoading(false);
     }
   }, [token]);
 
-  // Fetch clients and programs
+  // Fetch the aggregates computed by the backend
   const fetchData = async () => {
     setLoading(true);
     try {
-      const [clientsResponse, programsResponse] = await Promise.all([
-        axios.get('http://localhost:5001/api/clients', {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        axios.get('http://localhost:5001/api/programs', {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-      ]);
-
-      // Validate response data
-      const clientsData = Array.isArray(clientsResponse.data) ? clientsResponse.data : [];
-      const programsData = Array.isArray(programsResponse.data) ? programsResponse.data : [];
-
-      setClients(clientsData);
-      setPrograms(programsData);
-      setClientError('');
-      setProgramError('');
+      const response = await axios.get('http://localhost:5001/api/stats', {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      setStats(response.data);
+      setStatsError('');
     } catch (err: any) {
-      console.error('Failed to fetch data:', err.response?.data);
-      const errorMessage = err.response?.data?.message || 'Failed to load data.';
-      if (err.config.url.includes('/clients')) {
-        setClientError(errorMessage);
-        setClients([]);
-      } else {
-        setProgramError(errorMessage);
-        setPrograms([]);
-      }
+      console.error('Failed to fetch stats:', err.response?.data);
+      setStatsError(err.response?.data?.message || 'Failed to load data.');
+      setStats(null);
     } finally {
       setLoading(false);
     }
   };
 
-  // Memoized program counts
-  const programCounts = useMemo<ProgramCount[]>(() => {
-    return programs.map((program) => ({
-      name: program.name,
-      count: clients.filter((client) => client.programs.some((p) => p.id === program.id)).length,
-    }));
-  }, [clients, programs]);
+  const programCounts = stats?.programs ?? [];
+  const totalClients = stats?.total_clients ?? 0;
+  const totalPrograms = stats?.total_programs ?? 0;
 
-  // Memoized registration data
+  // Registration data
   const registrationData = useMemo(() => {
-    const uniqueDates = Array.from(
-      new Set(clients.map((client) => new Date(client.created_at).toLocaleDateString()))
-    ).sort((a, b) => new Date(a).getTime() - new Date(b).getTime());
+    const registrations = stats?.registrations ?? [];
     return {
-      labels: uniqueDates,
+      labels: registrations.map((r) => r.date),
       datasets: [
         {
           label: 'Client Registrations',
-          data: uniqueDates.map(
-            (date) =>
-              clients.filter((client) => new Date(client.created_at).toLocaleDateString() === date)
-                .length
-          ),
+          data: registrations.map((r) => r.count),
           borderColor: '#FF6384',
           backgroundColor: '#FF6384',
           fill: false,
@@ -126,18 +98,14 @@ const Dashboard: React.FC = () => {
         },
       ],
     };
-  }, [clients]);
+  }, [stats]);
 
   // Gender chart data
   const genderData = {
     labels: ['Male', 'Female', 'Other'],
     datasets: [
       {
-        data: [
-          clients.filter((client) => client.gender === 'Male').length,
-          clients.filter((client) => client.gender === 'Female').length,
-          clients.filter((client) => client.gender === 'Other').length,
-        ],
+        data: [stats?.genders.Male ?? 0, stats?.genders.Female ?? 0, stats?.genders.Other ?? 0],
         backgroundColor: ['#FF6384', '#36A2EB', '#FFCE56'],
         borderColor: ['#FFFFFF', '#FFFFFF', '#FFFFFF'],
         borderWidth: 1,
@@ -201,7 +169,7 @@ const Dashboard: React.FC = () => {
   }
 
   // Empty state
-  if (!clients.length && !programs.length && !clientError && !programError) {
+  if (!totalClients && !totalPrograms && !statsError) {
     return (
       <Container className="mt-4">
         <Alert variant="info">
@@ -214,9 +182,7 @@ const Dashboard: React.FC = () => {
   return (
     <Container className="mt-4">
       <h2 className="mb-4">{getGreeting()}, welcome back!</h2>
-      {(clientError || programError) && (
-        <Alert variant="danger">{clientError || programError}</Alert>
-      )}
+      {statsError && <Alert variant="danger">{statsError}</Alert>}
 
       {/* KPI Cards */}
       <Row className="mb-4 g-4">
@@ -224,7 +190,7 @@ const Dashboard: React.FC = () => {
           <Card className="text-center shadow-sm border-primary">
             <Card.Body>
               <h6>Total Clients</h6>
-              <h2>{clients.length}</h2>
+              <h2>{totalClients}</h2>
             </Card.Body>
           </Card>
         </Col>
@@ -232,7 +198,7 @@ const Dashboard: React.FC = () => {
           <Card className="text-center shadow-sm border-success">
             <Card.Body>
               <h6>Total Programs</h6>
-              <h2>{programs.length}</h2>
+              <h2>{totalPrograms}</h2>
             </Card.Body>
           </Card>
         </Col>
@@ -240,13 +206,7 @@ const Dashboard: React.FC = () => {
           <Card className="text-center shadow-sm border-warning">
             <Card.Body>
               <h6>New Clients (30d)</h6>
-              <h2>
-                {
-                  clients.filter(
-                    (c) => new Date(c.created_at) > new Date(Date.now() - 30 * 24 * 60 * 60 * 1000)
-                  ).length
-                }
-              </h2>
+              <h2>{stats?.new_clients_30d ?? 0}</h2>
             </Card.Body>
           </Card>
         </Col>
@@ -254,10 +214,7 @@ const Dashboard: React.FC = () => {
           <Card className="text-center shadow-sm border-info">
             <Card.Body>
               <h6>Active Programs</h6>
-              <h2>
-                {programs.filter((p) => clients.some((c) => c.programs.some((cp) => cp.id === p.id)))
-                  .length}
-              </h2>
+              <h2>{stats?.active_programs ?? 0}</h2>
             </Card.Body>
           </Card>
         </Col>
@@ -269,7 +226,7 @@ const Dashboard: React.FC = () => {
           <Card className="chart-card dashboard-chart shadow-sm border-light">
             <Card.Body>
               <Card.Title>Clients by Gender</Card.Title>
-              {clients.length && !clientError ? (
+              {totalClients && !statsError ? (
                 <div style={{ height: '250px' }}>
                   <Doughnut
                     data={genderData}
@@ -289,7 +246,7 @@ const Dashboard: React.FC = () => {
           <Card className="chart-card dashboard-chart shadow-sm border-light">
             <Card.Body>
               <Card.Title>Clients by Program</Card.Title>
-              {programs.length && !programError ? (
+              {totalPrograms && !statsError ? (
                 <div style={{ height: '250px' }}>
                   <Bar
                     data={programData}
@@ -313,7 +270,7 @@ const Dashboard: React.FC = () => {
           <Card className="chart-card dashboard-chart shadow-sm border-light">
             <Card.Body>
               <Card.Title>Registrations Over Time</Card.Title>
-              {clients.length && !clientError ? (
+              {totalClients && !statsError ? (
                 <div style={{ height: '250px' }}>
                   <Line
                     data={registrationData}
@@ -341,7 +298,7 @@ const Dashboard: React.FC = () => {
           <Card className="chart-card shadow-sm border-light">
             <Card.Body>
               <Card.Title>Recent Clients</Card.Title>
-              {clients.length && !clientError ? (
+              {totalClients && !statsError ? (
                 <table className="table table-hover table-bordered">
                   <thead>
                     <tr>
@@ -351,16 +308,13 @@ const Dashboard: React.FC = () => {
                     </tr>
                   </thead>
                   <tbody>
-                    {clients
-                      .sort((a, b) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime())
-                      .slice(0, 5)
-                      .map((client) => (
-                        <tr key={client.id}>
-                          <td>{client.first_name} {client.last_name}</td>
-                          <td>{client.email}</td>
-                          <td>{new Date(client.created_at).toLocaleDateString()}</td>
-                        </tr>
-                      ))}
+                    {(stats?.recent_clients ?? []).map((client) => (
+                      <tr key={client.id}>
+                        <td>{client.first_name} {client.last_name}</td>
+                        <td>{client.email}</td>
+                        <td>{new Date(client.created_at).toLocaleDateString()}</td>
+                      </tr>
+                    ))}
                   </tbody>
                 </table>
               ) : (